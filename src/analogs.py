@@ -0,0 +1,127 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from pathlib import Path
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import LAG_COLUMNS, ROLLING_COLUMN, TEMP_COLUMNS, build_features
+from history import HistoricalStore
+from ingest_weather import merge_weather
+
+BASE_DIR = Path().resolve()
+HIST_PATH = BASE_DIR / "data" / "processed" / "dataset_consulta.csv"
+
+DEMAND_COLUMNS = [*LAG_COLUMNS, ROLLING_COLUMN]
+# Hora y mes son cíclicos: las 23h están junto a las 0h y diciembre junto a enero
+CYCLIC_COLUMNS = {"hora": 24, "mes": 12}
+
+
+# -----------------------------------------
+# ÍNDICE DE HORAS ANÁLOGAS
+# -----------------------------------------
+class AnalogIndex:
+    """KD-tree sobre las condiciones de cada hora del histórico.
+
+    Cada hora se describe con los lags, la media móvil, hora y mes
+    (codificados con seno/coseno) y las temperaturas regionales que haya.
+    Las columnas se estandarizan (media 0, desviación 1) para que MW y ºC
+    pesen lo mismo en la distancia. El árbol se construye una vez y cada
+    consulta cuesta O(log n) en lugar de recorrer la tabla.
+    """
+
+    def __init__(self, frame, leaf_size=40):
+        from sklearn.neighbors import KDTree
+
+        start = time.perf_counter()
+        # Solo las temperaturas con datos: si no se han ingerido, se busca sin ellas
+        self.temp_columns = [col for col in TEMP_COLUMNS if col in frame and frame[col].notna().any()]
+        self.columns = [*DEMAND_COLUMNS, *CYCLIC_COLUMNS, *self.temp_columns]
+        frame = frame.dropna(subset=self.columns).reset_index(drop=True)
+        if frame.empty:
+            raise ValueError("No hay horas completas en el histórico para construir el índice")
+
+        vectors = self._encode(frame)
+        self.mean = vectors.mean(axis=0)
+        self.std = vectors.std(axis=0)
+        self.std[self.std == 0] = 1.0
+        self.tree = KDTree((vectors - self.mean) / self.std, leaf_size=leaf_size)
+        self.fechas = frame["fecha"].to_numpy()
+        self.demanda = frame["demanda_real"].to_numpy(dtype=np.float64)
+        self.values = frame[self.columns].to_numpy(dtype=np.float64)
+        self.build_seconds = time.perf_counter() - start
+
+    @classmethod
+    def from_store(cls, store, **kwargs):
+        return cls(build_features(merge_weather(store.to_frame())), **kwargs)
+
+    def __len__(self):
+        return len(self.demanda)
+
+    def _encode(self, frame):
+        # ``frame`` puede ser un DataFrame o un dict columna -> array
+        parts = [np.column_stack([np.asarray(frame[col], dtype=np.float64) for col in [*DEMAND_COLUMNS, *self.temp_columns]])]
+        for col, period in CYCLIC_COLUMNS.items():
+            angle = 2 * np.pi * np.asarray(frame[col], dtype=np.float64) / period
+            parts.append(np.column_stack([np.sin(angle), np.cos(angle)]))
+        return np.hstack(parts)
+
+    def vector(self, values):
+        """``values`` (dict con las variables) codificado y estandarizado como las filas del árbol."""
+        return (self._encode({col: [values[col]] for col in self.columns}) - self.mean) / self.std
+
+    def query(self, values, k=5):
+        """Las ``k`` horas históricas más parecidas a ``values`` (dict con las variables)."""
+        vector = self.vector(values)
+        distance, rows = self.tree.query(vector, k=min(k, len(self)))
+        rows = rows[0]
+        result = pd.DataFrame(self.values[rows], columns=self.columns)
+        result.insert(0, "fecha", self.fechas[rows])
+        result.insert(1, "demanda_real", self.demanda[rows])
+        result.insert(2, "distancia", distance[0])
+        return result
+
+
+# -----------------------------------------
+# CLI
+# -----------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Horas del histórico más parecidas a unas condiciones dadas")
+    parser.add_argument("--data", default=str(HIST_PATH), help="Dataset histórico (CSV de origen de la caché)")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=1000, help="Consultas para medir la latencia")
+    args = parser.parse_args(argv)
+
+    index = AnalogIndex.from_store(HistoricalStore(args.data))
+    print(f"Índice de {len(index):,} horas y {len(index.columns)} variables en {index.build_seconds:.2f}s")
+
+    # Consultas con horas reales del histórico, como referencia de latencia
+    rng = np.random.default_rng(0)
+    samples = [dict(zip(index.columns, index.values[i])) for i in rng.integers(0, len(index), args.queries)]
+    start = time.perf_counter()
+    for values in samples:
+        result = index.query(values, args.k)
+    elapsed = (time.perf_counter() - start) / len(samples) * 1000
+    print(f"Consulta k={args.k} (con codificación y DataFrame): {elapsed:.2f} ms de media")
+
+    # Búsqueda sola frente al recorrido completo de la tabla: mismos vectores
+    # ya codificados, mismas consultas y mismas distancias
+    vectors = [index.vector(values) for values in samples]
+    start = time.perf_counter()
+    for vector in vectors:
+        index.tree.query(vector, k=args.k)
+    tree = (time.perf_counter() - start) / len(vectors) * 1000
+    data = np.asarray(index.tree.data)
+    start = time.perf_counter()
+    for vector in vectors:
+        np.argpartition(((data - vector) ** 2).sum(axis=1), args.k)[:args.k]
+    scan = (time.perf_counter() - start) / len(vectors) * 1000
+    print(f"Búsqueda: KD-tree {tree:.3f} ms | recorrido completo {scan:.3f} ms (x{scan / tree:.0f})")
+    print(result.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,97 @@
 # -----------------------------------------
 # IMPORTS
 # -----------------------------------------
+# Solo lo imprescindible para pintar el EDA: pandas, numpy, altair y la pila
+# del modelo (joblib/xgboost) se importan al entrar en Predicción
 from pathlib import Path
-import joblib
-import pandas as pd
+import shutil
+import sys
+import tempfile
 import streamlit as st
-import numpy as np
 
 BASE_DIR = Path().resolve()
 MODEL_PATH = BASE_DIR / "models" / "xgb_model.pkl"
+HIST_PATH = BASE_DIR / "data" / "processed" / "dataset_consulta.csv"
+IMAGES_DIR = BASE_DIR / "data" / "Images"
+IMAGES_CACHE_DIR = BASE_DIR / "data" / "interim" / "images"
 
-try:
-    model = joblib.load(MODEL_PATH)
-except FileNotFoundError:
-    raise FileNotFoundError(f"No se encontró el modelo en: {MODEL_PATH}")
+if str(BASE_DIR / "src") not in sys.path:
+    sys.path.insert(0, str(BASE_DIR / "src"))
+from profiling import ProfileLog, StageTimer, default_log_path
+
+
+# Pool de modelos compartido por todas las sesiones: cada modelo se carga la
+# primera vez que se usa y los menos usados se liberan al superar el
+# presupuesto (APP_MODEL_BUDGET_MB)
+@st.cache_resource
+def get_model_pool():
+    import os
+    from model_pool import DEFAULT_BUDGET_MB, ModelPool
+    return ModelPool(MODEL_PATH, float(os.getenv("APP_MODEL_BUDGET_MB", DEFAULT_BUDGET_MB)))
+
+
+# Sin caché propia: el pool decide qué modelos siguen en memoria
+def get_model_store(path=MODEL_PATH):
+    return get_model_pool().store(path)
+
+
+# Histórico en caché columnar e indexado, también compartido entre sesiones
+@st.cache_resource
+def get_history_store():
+    from history import HistoricalStore
+    return HistoricalStore(HIST_PATH)
+
+
+# Índice de horas análogas (KD-tree), se reconstruye si el histórico crece
+@st.cache_resource(max_entries=1)
+def get_analog_index(n_horas):
+    from analogs import AnalogIndex
+    return AnalogIndex.from_store(get_history_store())
+
+
+# Caché LRU de predicciones compartida entre sesiones, una por fichero de modelo
+# (se vacía si cambia su versión)
+@st.cache_resource
+def get_prediction_cache(path=MODEL_PATH):
+    from prediction_cache import PredictionCache
+    return PredictionCache()
+
+
+# Pronósticos precalculados (los publica forecast_service.py o el servidor con
+# --precompute); con APP_FORECAST_SCHEDULER=1 la propia app lanza el hilo
+@st.cache_resource
+def get_forecast_cache():
+    import os
+    from forecast_service import ForecastCache, ForecastScheduler
+
+    cache = ForecastCache()
+    if os.getenv("APP_FORECAST_SCHEDULER") == "1":
+        ForecastScheduler(get_model_store(), get_history_store(), cache).start()
+    return cache
+
+
+# Estado del monitor (lo escribe monitoring.py); se relee solo si cambia el fichero
+@st.cache_resource(max_entries=1)
+def get_monitor(mtime):
+    from monitoring import Monitor
+    return Monitor.load()
+
+
+# Tiempos por fase agregados entre sesiones (solo con APP_PROFILE=1)
+@st.cache_resource
+def get_profile_log():
+    return ProfileLog(default_log_path(BASE_DIR))
+
+
+# Imágenes del EDA re-codificadas una vez (WebP al ancho de la página)
+@st.cache_data
+def imagen_eda(nombre):
+    from assets import optimized_image
+    return optimized_image(IMAGES_DIR / nombre, IMAGES_CACHE_DIR).read_bytes()
+
+
+perfil = StageTimer()
+model_path = MODEL_PATH
 
 # -----------------------------
 # CONFIG
@@ -49,7 +127,8 @@ Decidimos abordar uno de los problemas más costosos y críticos del sector indu
 El sistema eléctrico no puede almacenar energía a gran escala; lo que se genera debe consumirse al instante.
 El reto principal que enfrentamos no fue solo técnico, sino de comportamiento: la demanda eléctrica es el resultado de millones de decisiones humanas.
     """)
-    st.image(BASE_DIR / "data" / "Images" / "01.png", use_column_width=True)
+    with perfil.stage("imagenes"):
+        st.image(imagen_eda("01.png"), use_column_width=True)
 
     # --------------------------
     # 2. Estrategia de Datos
@@ -59,7 +138,8 @@ El reto principal que enfrentamos no fue solo técnico, sino de comportamiento:
     st.write("""
 Al principio, planteamos la hipótesis de que la demanda dependía casi exclusivamente de la temperatura. Sin embargo, al analizar los datos en profundidad, nos dimos cuenta de que las variables climáticas clásicas solo tenían una correlación moderada con el consumo real (alrededor de un 0.4).
     """)
-    st.image(BASE_DIR / "data" / "Images" / "02.png", use_column_width=True)
+    with perfil.stage("imagenes"):
+        st.image(imagen_eda("02.png"), use_column_width=True)
 
     # --------------------------
     # 3. Lags y la clave temporal
@@ -75,7 +155,8 @@ Llegamos a la conclusión de que el mejor predictor del consumo actual no es el
 
 Por ello, construimos variables de 'Lags' o retardos temporales.
     """)
-    st.image(BASE_DIR / "data" / "Images" / "03.png", use_column_width=True)
+    with perfil.stage("imagenes"):
+        st.image(imagen_eda("03.png"), use_column_width=True)
 
     # --------------------------
     # 4. Batalla de Modelos
@@ -87,7 +168,8 @@ Con los datos listos, llegamos a la fase de modelado. Decidimos poner a competir
 En las métricas, N-BEATS nos dio un R^2 negativo (-34). Fue incapaz de encontrar patrones estables con el volumen de datos disponible.
 En contraste, nuestro modelo XGBoost alcanzó el 0.99.
     """)
-    st.image(BASE_DIR / "data" / "Images" / "04.png", use_column_width=True)
+    with perfil.stage("imagenes"):
+        st.image(imagen_eda("04.png"), use_column_width=True)
 
     # --------------------------
     # 5. Validación y Resultados
@@ -98,7 +180,8 @@ En contraste, nuestro modelo XGBoost alcanzó el 0.99.
 Para evitar engañarnos con métricas de entrenamiento, diseñamos una validación temporal estricta.
 Mantuvimos el R^2 superior a 0.99 y, visualmente, el modelo replicó perfectamente la dinámica diaria y las caídas de los fines de semana.
     """)
-    st.image(BASE_DIR / "data" / "Images" / "05.png", use_column_width=True)
+    with perfil.stage("imagenes"):
+        st.image(imagen_eda("05.png"), use_column_width=True)
 
     # --------------------------
     # 6. Limitaciones y Observaciones
@@ -116,6 +199,40 @@ Mantuvimos el R^2 superior a 0.99 y, visualmente, el modelo replicó perfectamen
 # SECCIÓN: PREDICCIÓN
 # ===========================
 if seccion == "Predicción":
+    import altair as alt
+    import pandas as pd
+
+    from batch_predict import predict_file
+    from explain import CONTRIB_PREFIX, waterfall
+    from forecast import RecursiveForecaster, LAG_WINDOW
+    from forecast_service import freshness
+    from sweeps import SWEEP_AXES, PRED_COLUMN, sweep
+
+    from registry import ModelRegistry
+
+    # Modelo en producción o cualquier versión del registro (models/registry)
+    registro_modelos = ModelRegistry()
+    versiones = registro_modelos.versions()
+    modelo_sel = st.sidebar.selectbox("Modelo", ["Producción", *reversed(versiones)], index=0)
+    comparar_con = st.sidebar.multiselect(
+        "Comparar con", [m for m in ["Producción", *reversed(versiones)] if m != modelo_sel],
+        help="Se cargan solo al usarlos y comparten el presupuesto de memoria de modelos")
+    model_path = MODEL_PATH if modelo_sel == "Producción" else registro_modelos.model_path(modelo_sel)
+    if modelo_sel != "Producción":
+        meta = registro_modelos.metadata(modelo_sel)
+        if meta.get("metrics"):
+            # Cada versión valida en su propia ventana: sin ella las MAE no se pueden comparar
+            ventana = meta["metrics"].get("window")
+            validacion = (f"{ventana['rows']} h, {ventana['first_fecha'][:10]}..{ventana['last_fecha'][:10]}"
+                          if ventana else f"últimas {meta.get('valid_hours', '?')} h")
+            st.sidebar.caption(f"{meta['mode']} · {meta['n_trees']} árboles · MAE {meta['metrics']['mae']:.1f} MW "
+                               f"(validación: {validacion})")
+
+    with perfil.stage("carga_modelo"):
+        fast_predictor = get_model_pool().predictor(model_path)
+        model_store = get_model_store(model_path)
+        model = model_store.get()
+
     # Título principal
     st.markdown(
         "<h1 style='text-align:center; font-size:32px; font-weight:bold; margin-bottom:30px;'>⚡ Predicción de Demanda Eléctrica ⚡</h1>",
@@ -202,44 +319,40 @@ if seccion == "Predicción":
         temp_and = st.selectbox("Región Sur (ºC)", temp_valores, index=temp_valores.index(33))
 
     # -----------------------------
-    # DataFrame para el modelo
+    # Fila para el modelo (float32, orden de model.feature_names_in_)
     # -----------------------------
-    X_input = pd.DataFrame([{
-        "demanda_lag_1": demanda_lag_1,
-        "demanda_lag_24": demanda_lag_24,
-        "demanda_lag_168": demanda_lag_168,
-        "media_movil_24h": media_movil_24h,
-        "hora": hora_real,
-        "mes": mes,
-        "es_finde": es_finde_num,
-        "dia_semana": dia_semana,
-        "Madrid_temperature_2m": temp_mad,
-        "Valencia_temperature_2m": temp_val,
-        "Pais_Vasco_temperature_2m": temp_pv,
-        "Cataluna_temperature_2m": temp_cat,
-        "Andalucia_temperature_2m": temp_and
-    }])
-    for col in model.feature_names_in_:
-        if col not in X_input.columns: X_input[col] = 0.0
-    X_input = X_input[model.feature_names_in_]
-
-    # -----------------------------
-    # Cargar dataset histórico
-    # -----------------------------
-    HIST_PATH = BASE_DIR / "data" / "processed" / "dataset_consulta.csv"
-    try:
-        df_hist = pd.read_csv(HIST_PATH)
-        df_hist["fecha"] = pd.to_datetime(df_hist["fecha"])
-        df_hist["dia_semana"] = df_hist["fecha"].dt.weekday + 1
-    except FileNotFoundError:
-        st.error(f"No se encontró el dataset histórico en: {HIST_PATH}")
-        df_hist = pd.DataFrame()
+    with perfil.stage("fila_modelo"):
+        valores = {
+            "demanda_lag_1": demanda_lag_1,
+            "demanda_lag_24": demanda_lag_24,
+            "demanda_lag_168": demanda_lag_168,
+            "media_movil_24h": media_movil_24h,
+            "hora": hora_real,
+            "mes": mes,
+            "es_finde": es_finde_num,
+            "dia_semana": dia_semana,
+            "Madrid_temperature_2m": temp_mad,
+            "Valencia_temperature_2m": temp_val,
+            "Pais_Vasco_temperature_2m": temp_pv,
+            "Cataluna_temperature_2m": temp_cat,
+            "Andalucia_temperature_2m": temp_and
+        }
+        X_input = fast_predictor.row(valores)
 
     # -----------------------------
     # Predicción y comparaciones
     # -----------------------------
     if st.button("Calcular"):
-        pred = model.predict(X_input)[0]
+        # Predicción y contribuciones por variable en una sola llamada; se
+        # guardan juntas en la caché
+        def predecir_y_explicar():
+            pred, contribs = fast_predictor.explain(X_input)
+            return float(pred[0]), contribs[0]
+
+        with perfil.stage("predict"):
+            pred, contribuciones = get_prediction_cache(model_path).get_or_compute(
+                model_store.version, X_input, predecir_y_explicar
+            )
         st.markdown(f"""
         <div style='background-color:#d4edda; color:#155724; padding:10px 20px; border-radius:5px; text-align:center; margin-bottom:10px;'>
             <div style='font-size:18px; font-weight:normal;'>La predicción de demanda real es de:</div>
@@ -247,16 +360,56 @@ if seccion == "Predicción":
         </div>
         """, unsafe_allow_html=True)
 
+        # -----------------------------
+        # Por qué sale esta predicción (cascada de contribuciones)
+        # -----------------------------
+        with st.expander("🔍 ¿Por qué esta predicción?"):
+            st.write("Contribución de cada variable (TreeSHAP) desde el valor base del modelo hasta la predicción.")
+            cascada = waterfall(fast_predictor.features, contribuciones, X_input[0], top=8)
+            cascada["signo"] = cascada["contribucion"].map(lambda c: "sube" if c >= 0 else "baja")
+            cascada.loc[cascada["variable"].isin(["Base", "Predicción"]), "signo"] = "total"
+            barras = alt.Chart(cascada).mark_bar().encode(
+                y=alt.Y("variable:N", sort=None, title=None),
+                x=alt.X("inicio:Q", title="MW", scale=alt.Scale(zero=False)),
+                x2="fin:Q",
+                color=alt.Color("signo:N", legend=None,
+                                scale=alt.Scale(domain=["sube", "baja", "total"], range=["#e74c3c", "#2ecc71", "#f39f18"])),
+                tooltip=["variable", alt.Tooltip("valor:Q", format=",.1f"), alt.Tooltip("contribucion:Q", format="+,.0f")],
+            )
+            st.altair_chart(barras, use_container_width=True)
+
+        # -----------------------------
+        # Mismas entradas con otros modelos (una llamada por modelo)
+        # -----------------------------
+        if comparar_con:
+            nombres = [modelo_sel, *comparar_con]
+            rutas = [MODEL_PATH if m == "Producción" else registro_modelos.model_path(m) for m in nombres]
+            with perfil.stage("comparar_modelos"):
+                comparacion = get_model_pool().compare(rutas, valores)
+            comparacion.columns = nombres
+            st.markdown("**Comparación de modelos**")
+            st.dataframe(
+                comparacion.T.rename(columns={0: "Predicción (MW)"})
+                .assign(**{"Diferencia (MW)": lambda d: d["Predicción (MW)"] - pred})
+                .style.format("{:,.0f}"),
+            )
+
         # separación mínima antes de comparaciones históricas
         st.markdown("<div style='margin-top:10px;'></div>", unsafe_allow_html=True)
 
-        if not df_hist.empty:
-            for año in [2022, 2024]:
-                comparacion = df_hist[
-                    (df_hist["year"]==año)&(df_hist["mes"]==mes)&(df_hist["dia_semana"]==dia_semana)&(df_hist["hora"]==hora_real)
-                ]
-                if not comparacion.empty:
-                    valor_real = comparacion["demanda_real"].values[0]
+        # -----------------------------
+        # Comparación con el histórico (todos los años disponibles)
+        # -----------------------------
+        try:
+            with perfil.stage("historico"):
+                historico = get_history_store().lookup_years(mes, dia_semana, hora_real)
+        except FileNotFoundError:
+            st.error(f"No se encontró el dataset histórico en: {HIST_PATH}")
+            historico = {}
+
+        if historico:
+            for año, valor_real in historico.items():
+                if valor_real is not None:
                     st.markdown(f"""
                     <div style='background-color:#fff3cd; color:#856404; padding:8px 15px; border-radius:5px; margin-bottom:5px;'>
                         En esta fecha y hora del año {año} la demanda real fue de {valor_real:,.0f} MW
@@ -268,3 +421,190 @@ if seccion == "Predicción":
                         En esta fecha y hora del año {año} no hay datos disponibles.
                     </div>
                     """, unsafe_allow_html=True)
+
+            # -----------------------------
+            # Horas pasadas más parecidas (vecinos más próximos)
+            # -----------------------------
+            with perfil.stage("analogos"):
+                analogos = get_analog_index(len(get_history_store())).query(valores, k=5)
+            st.markdown("**Horas del histórico con condiciones más parecidas**")
+            st.dataframe(
+                analogos[["fecha", "demanda_real", "distancia", "demanda_lag_1", "hora", "mes"]].rename(
+                    columns={"demanda_real": "Demanda real (MW)", "demanda_lag_1": "Hace 1 hora (MW)"}),
+                hide_index=True,
+            )
+
+    # -----------------------------
+    # Análisis de sensibilidad (what-if)
+    # -----------------------------
+    with st.expander("📈 Análisis de sensibilidad"):
+        st.write("Cómo cambia la predicción al mover una o dos variables, con el resto fijas en los valores seleccionados arriba. Toda la rejilla se predice en una sola llamada al modelo.")
+        nombres_ejes = {
+            "hora": "Hora del día",
+            "mes": "Mes",
+            "dia_semana": "Día de la semana",
+            "Madrid_temperature_2m": "Región Central (ºC)",
+            "Valencia_temperature_2m": "Región Sureste (ºC)",
+            "Pais_Vasco_temperature_2m": "Región Norte (ºC)",
+            "Cataluna_temperature_2m": "Región Noreste (ºC)",
+            "Andalucia_temperature_2m": "Región Sur (ºC)",
+            "demanda_lag_1": "Demanda hace 1 hora",
+            "demanda_lag_24": "Demanda hace 24 horas",
+            "demanda_lag_168": "Demanda hace 7 días",
+            "media_movil_24h": "Media últimas 24 horas",
+        }
+        col1, col2 = st.columns(2)
+        with col1:
+            eje_x = st.selectbox("Eje principal", list(nombres_ejes), format_func=nombres_ejes.get)
+        with col2:
+            eje_y = st.selectbox("Segundo eje (opcional)", [None] + [n for n in nombres_ejes if n != eje_x],
+                                 format_func=lambda n: "Ninguno" if n is None else nombres_ejes[n])
+        desglose = eje_y is None and st.checkbox("Desglosar por variable (contribuciones)")
+        if st.button("Calcular barrido"):
+            ejes = {eje_x: SWEEP_AXES[eje_x]}
+            if eje_y is not None:
+                ejes[eje_y] = SWEEP_AXES[eje_y]
+            with perfil.stage("barrido"):
+                barrido = sweep(fast_predictor, X_input, ejes, explain=desglose)
+            if eje_y is None:
+                st.line_chart(barrido.set_index(eje_x)[PRED_COLUMN])
+                if desglose:
+                    # Solo las variables cuya contribución cambia a lo largo del barrido
+                    contrib = barrido.set_index(eje_x).filter(like=CONTRIB_PREFIX)
+                    contrib = contrib.loc[:, contrib.std() > 1.0].rename(columns=lambda c: c.removeprefix(CONTRIB_PREFIX))
+                    st.line_chart(contrib.rename_axis(nombres_ejes[eje_x]))
+            else:
+                mapa = alt.Chart(barrido).mark_rect().encode(
+                    x=alt.X(f"{eje_x}:O", title=nombres_ejes[eje_x]),
+                    y=alt.Y(f"{eje_y}:O", title=nombres_ejes[eje_y], sort="descending"),
+                    color=alt.Color(f"{PRED_COLUMN}:Q", title="MW", scale=alt.Scale(scheme="orangered")),
+                    tooltip=[eje_x, eje_y, alt.Tooltip(f"{PRED_COLUMN}:Q", format=",.0f")],
+                )
+                st.altair_chart(mapa, use_container_width=True)
+
+    # -----------------------------
+    # Pronóstico multi-paso
+    # -----------------------------
+    with st.expander("🔮 Pronóstico de las próximas horas"):
+        # Pronóstico publicado en segundo plano: leerlo no cuesta trabajo de modelo
+        precalculado = get_forecast_cache().read()
+        if precalculado is not None:
+            frescura = freshness(precalculado, get_history_store())
+            st.markdown(f"**Próximas {precalculado['horizon']} horas (precalculado)**")
+            st.line_chart(pd.DataFrame(precalculado["forecast"]).assign(
+                fecha=lambda d: pd.to_datetime(d["fecha"])).set_index("fecha")["demanda_pred"])
+            st.caption(
+                f"Calculado hace {frescura['age_seconds'] / 60:.0f} min con datos reales hasta "
+                f"{frescura['data_last_fecha']}"
+                + ("" if frescura["up_to_date"] else " · ⚠️ hay datos nuevos pendientes de pronosticar")
+            )
+        st.write("Pronóstico recursivo desde el final del histórico: cada hora predicha se usa como retardo de la siguiente. Las temperaturas se mantienen en los valores seleccionados arriba.")
+        horizonte = st.radio("Horizonte", [24, 168], format_func=lambda h: f"{h} horas", horizontal=True)
+        if st.button("Pronosticar"):
+            try:
+                with perfil.stage("historico"):
+                    ultima_fecha, demandas = get_history_store().latest_demand(LAG_WINDOW)
+            except FileNotFoundError:
+                st.error(f"No se encontró el dataset histórico en: {HIST_PATH}")
+            else:
+                temperaturas = {
+                    "Madrid_temperature_2m": temp_mad,
+                    "Valencia_temperature_2m": temp_val,
+                    "Pais_Vasco_temperature_2m": temp_pv,
+                    "Cataluna_temperature_2m": temp_cat,
+                    "Andalucia_temperature_2m": temp_and,
+                }
+                with perfil.stage("pronostico"):
+                    pronostico = RecursiveForecaster(model).forecast(
+                        demandas, ultima_fecha + pd.Timedelta(hours=1), horizonte, temperaturas
+                    )
+                st.line_chart(pronostico.set_index("fecha")["demanda_pred"])
+
+    # -----------------------------
+    # Monitorización
+    # -----------------------------
+    with st.expander("📡 Monitorización del modelo"):
+        from monitoring import STATE_PATH
+
+        monitor = get_monitor(STATE_PATH.stat().st_mtime_ns) if STATE_PATH.exists() else None
+        if monitor is None:
+            st.info("Aún no hay estado de monitorización. Ejecuta `python src/monitoring.py --follow` para seguir las horas reales nuevas.")
+        else:
+            resumen_mon = monitor.summary()
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Horas monitorizadas", f"{resumen_mon['n']:,}")
+            c2.metric("MAE acumulado", f"{resumen_mon['mae']:,.0f} MW")
+            c3.metric("MAE últimas 24h", f"{resumen_mon['mae_24h']:,.0f} MW",
+                      delta=f"{resumen_mon['mae_24h'] - resumen_mon['mae']:+,.0f} MW", delta_color="inverse")
+            st.caption(f"Última hora real: {resumen_mon['last_fecha']} · sesgo {resumen_mon['residual_mean']:+,.0f} MW")
+
+            panel = monitor.panel_frame().assign(fecha=lambda d: pd.to_datetime(d["fecha"])).set_index("fecha")
+            st.markdown("**Real frente a predicción**")
+            st.line_chart(panel[["demanda_real", "demanda_pred"]])
+            st.markdown("**Residuo y MAE de las últimas 24 horas**")
+            st.line_chart(panel[["residuo", "mae_24h"]])
+            st.markdown("**MAE por hora del día (últimos días)**")
+            st.bar_chart(pd.Series(resumen_mon["mae_by_hour"], name="MAE (MW)").rename_axis("hora"))
+
+            st.markdown("**Deriva de las entradas**")
+            st.dataframe(pd.DataFrame(resumen_mon["drift"]).T.rename(
+                columns={"shift": "desplazamiento (σ)", "shift_limit": "umbral desplazamiento", "psi": "PSI",
+                         "psi_limit": "umbral PSI"}).style.format("{:.2f}"))
+            if resumen_mon["active_alerts"]:
+                st.warning("Alertas activas: " + ", ".join(resumen_mon["active_alerts"]))
+            if monitor.alerts:
+                st.markdown("**Últimas alertas**")
+                st.dataframe(pd.DataFrame(list(monitor.alerts)[::-1]), hide_index=True)
+
+    # -----------------------------
+    # Predicción por lotes
+    # -----------------------------
+    with st.expander("📁 Predicción por lotes (CSV / Parquet)"):
+        st.write("Sube un fichero con las variables del modelo (una fila por hora). Se procesa por bloques y el resultado se escribe a disco.")
+        fichero = st.file_uploader("Fichero de entrada", type=["csv", "parquet"])
+        tam_bloque = st.number_input("Filas por bloque", min_value=1_000, max_value=500_000, value=50_000, step=1_000)
+        con_contribuciones = st.checkbox("Incluir contribuciones por variable (aproximadas)")
+        if fichero is not None and st.button("Procesar fichero"):
+            sufijo = Path(fichero.name).suffix
+            # download_button copia los bytes al servidor de medios: el directorio
+            # temporal se borra al terminar, también si la predicción falla
+            with tempfile.TemporaryDirectory(prefix="lotes_") as tmp:
+                tmp_dir = Path(tmp)
+                entrada = tmp_dir / f"entrada{sufijo}"
+                salida = tmp_dir / f"predicciones{sufijo}"
+                with open(entrada, "wb") as fh:
+                    shutil.copyfileobj(fichero, fh)
+
+                barra = st.progress(0.0, text="Prediciendo...")
+
+                def progreso(hechas, total):
+                    barra.progress(min(hechas / total, 1.0) if total else 1.0, text=f"{hechas:,} / {total:,} filas")
+
+                with perfil.stage("lotes"):
+                    resumen = predict_file(model, entrada, salida, int(tam_bloque), progreso, explain=con_contribuciones)
+                if resumen["missing_features"]:
+                    st.warning(f"Columnas ausentes rellenadas con 0.0: {', '.join(resumen['missing_features'])}")
+                st.success(f"{resumen['rows']:,} filas en {resumen['seconds']:.2f}s")
+                with open(salida, "rb") as fh:
+                    st.download_button("Descargar predicciones", fh, file_name=f"predicciones{sufijo}")
+
+# ===========================
+# DIAGNÓSTICO (APP_PROFILE=1)
+# ===========================
+if perfil.enabled:
+    import pandas as pd
+
+    tiempos, informe_muestreo = perfil.finish()
+    registro = get_profile_log()
+    registro.record(tiempos, {"seccion": seccion}, informe_muestreo)
+    with st.sidebar.expander("🩺 Diagnóstico"):
+        st.caption("Esta ejecución (ms)")
+        st.dataframe(pd.DataFrame({"ms": {k: v * 1000 for k, v in tiempos.items()}}))
+        st.caption(f"Agregado de {registro.runs} ejecuciones (todas las sesiones)")
+        st.dataframe(pd.DataFrame(registro.summary()).T)
+        st.caption("Modelo y caché")
+        st.json({"modelo": get_model_store(model_path).metrics(), "cache": get_prediction_cache(model_path).stats(),
+                 "pool": get_model_pool().stats()}, expanded=False)
+        if registro.last_sampler_report:
+            st.caption("Último perfil por muestreo")
+            st.code(registro.last_sampler_report)
@@ -0,0 +1,54 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from pathlib import Path
+import io
+import os
+
+# Ancho máximo útil: layout "centered" (~700 px) en pantallas de densidad 2x
+MAX_WIDTH = 1400
+WEBP_QUALITY = 85
+
+
+# -----------------------------------------
+# IMÁGENES DEL EDA PRE-OPTIMIZADAS
+# -----------------------------------------
+def optimized_image(source, cache_dir, max_width=MAX_WIDTH, quality=WEBP_QUALITY):
+    """Ruta de una variante WebP redimensionada de ``source``, generándola si hace falta.
+
+    La variante se guarda en ``cache_dir`` y solo se regenera si la imagen
+    original es más reciente. Si Pillow no tiene soporte WebP se devuelve la
+    imagen original.
+    """
+    from PIL import Image, features
+
+    source = Path(source)
+    if not features.check("webp"):
+        return source
+    target = Path(cache_dir) / f"{source.stem}-{max_width}w.webp"
+    if target.exists() and target.stat().st_mtime >= source.stat().st_mtime:
+        return target
+
+    with Image.open(source) as img:
+        img = img.convert("RGB")
+        if img.width > max_width:
+            img = img.resize((max_width, round(img.height * max_width / img.width)), Image.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, "WEBP", quality=quality, method=6)
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(".tmp")
+    tmp.write_bytes(buffer.getvalue())
+    os.replace(tmp, target)
+    return target
+
+
+def prepare_images(image_dir, cache_dir, max_width=MAX_WIDTH, quality=WEBP_QUALITY):
+    """Genera de una vez las variantes de todos los PNG de ``image_dir``."""
+    return [optimized_image(path, cache_dir, max_width, quality) for path in sorted(Path(image_dir).glob("*.png"))]
+
+
+if __name__ == "__main__":
+    base_dir = Path().resolve()
+    for path in prepare_images(base_dir / "data" / "Images", base_dir / "data" / "interim" / "images"):
+        print(f"{path} ({path.stat().st_size / 1024:.0f} KB)")
@@ -0,0 +1,222 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from fast_predict import FastPredictor
+from features import LAG_COLUMNS, ROLLING_COLUMN, align_features, build_features
+from history import HistoricalStore
+from ingest_weather import merge_weather
+from model_store import ModelStore
+from registry import resolve_model
+
+BASE_DIR = Path().resolve()
+MODEL_PATH = BASE_DIR / "models" / "xgb_model.pkl"
+HIST_PATH = BASE_DIR / "data" / "processed" / "dataset_consulta.csv"
+REPORT_DIR = BASE_DIR / "data" / "interim"
+
+
+# -----------------------------------------
+# FOLDS TEMPORALES
+# -----------------------------------------
+def make_folds(n_rows, n_folds=5, test_size=24 * 30, mode="expanding", train_size=None):
+    """Folds walk-forward como tuplas (train_ini, train_fin, test_ini, test_fin).
+
+    Los bloques de test son consecutivos y cubren el final de la serie. En
+    modo ``expanding`` el entrenamiento empieza siempre en la fila 0; en
+    ``sliding`` es una ventana de ``train_size`` filas justo antes del test.
+    """
+    first_test = n_rows - n_folds * test_size
+    if first_test <= 0:
+        raise ValueError(f"No hay filas suficientes para {n_folds} folds de {test_size} horas")
+    folds = []
+    for k in range(n_folds):
+        test_start = first_test + k * test_size
+        if mode == "sliding":
+            if train_size is None:
+                raise ValueError("El modo sliding necesita train_size")
+            train_start = max(test_start - train_size, 0)
+        elif mode == "expanding":
+            train_start = 0
+        else:
+            raise ValueError(f"Modo desconocido: {mode}")
+        folds.append((train_start, test_start, test_start, test_start + test_size))
+    return folds
+
+
+# -----------------------------------------
+# TRABAJO DE CADA PROCESO
+# -----------------------------------------
+_WORKER = {}
+
+
+def _load_dataset(model_path, hist_path):
+    model = ModelStore(model_path).get()
+    df = build_features(merge_weather(HistoricalStore(hist_path).to_frame()))
+    df = df.dropna(subset=[*LAG_COLUMNS, ROLLING_COLUMN]).reset_index(drop=True)
+    X = align_features(df, model.feature_names_in_).to_numpy(dtype=np.float32)
+    y = df["demanda_real"].to_numpy(dtype=np.float64)
+    missing = [str(col) for col in model.feature_names_in_ if col not in df.columns]
+    return model, df["fecha"], X, y, missing
+
+
+def _init_worker(model_path, hist_path, threads):
+    # Cada proceso carga modelo y datos una vez; el histórico se abre con
+    # mmap, así que las páginas del fichero se comparten entre procesos
+    model, fechas, X, y, _ = _load_dataset(model_path, hist_path)
+    model.get_booster().set_param({"nthread": threads})
+    _WORKER.update(model=model, fechas=fechas, X=X, y=y, threads=threads)
+
+
+def regression_metrics(y_true, y_pred):
+    err = y_pred - y_true
+    ss_res = float(np.sum(err ** 2))
+    ss_tot = float(np.sum((y_true - y_true.mean()) ** 2))
+    return {
+        "mae": float(np.mean(np.abs(err))),
+        "rmse": float(np.sqrt(np.mean(err ** 2))),
+        "r2": 1.0 - ss_res / ss_tot if ss_tot > 0 else None,
+    }
+
+
+def _run_fold(args):
+    k, (train_start, train_end, test_start, test_end), refit = args
+    model, X, y, fechas = _WORKER["model"], _WORKER["X"], _WORKER["y"], _WORKER["fechas"]
+    start = time.perf_counter()
+    fit_seconds = 0.0
+    if refit:
+        from xgboost import XGBRegressor
+
+        params = model.get_params()
+        params.update(tree_method="hist", n_jobs=_WORKER["threads"], early_stopping_rounds=None)
+        features = [str(col) for col in model.feature_names_in_]
+        X_train = pd.DataFrame(X[train_start:train_end], columns=features)
+        model = XGBRegressor(**params).fit(X_train, y[train_start:train_end])
+        fit_seconds = time.perf_counter() - start
+
+    predictor = FastPredictor(model)
+    t0 = time.perf_counter()
+    y_pred = predictor.predict(X[test_start:test_end]).astype(np.float64)
+    predict_seconds = time.perf_counter() - t0
+    rows = test_end - test_start
+    # Sin reentrenar no hay ventana de entrenamiento que informar: el modelo
+    # guardado se entrenó con lo que fuera (quizá incluso el bloque de test)
+    train = {
+        "train": [str(fechas.iloc[train_start]), str(fechas.iloc[train_end - 1])],
+        "train_rows": train_end - train_start,
+    } if refit else {}
+    return {
+        "fold": k,
+        **train,
+        "test": [str(fechas.iloc[test_start]), str(fechas.iloc[test_end - 1])],
+        "test_rows": rows,
+        **regression_metrics(y[test_start:test_end], y_pred),
+        "fit_seconds": fit_seconds,
+        "predict_seconds": predict_seconds,
+        "rows_per_second": rows / predict_seconds if predict_seconds > 0 else None,
+        "wall_seconds": time.perf_counter() - start,
+    }
+
+
+# -----------------------------------------
+# BACKTEST
+# -----------------------------------------
+def run_backtest(model_path=MODEL_PATH, hist_path=HIST_PATH, n_folds=5, test_size=24 * 30,
+                 mode="expanding", train_size=None, refit=True, workers=None):
+    """Ejecuta los folds en un pool de procesos y devuelve el informe (dict).
+
+    Con ``refit`` (walk-forward) se reentrena en cada fold con los mismos
+    hiperparámetros y ``tree_method="hist"`` sobre su ventana de
+    entrenamiento. Sin ``refit`` se evalúa el modelo guardado en cada bloque
+    de test: no es un backtest (el modelo puede haber visto esos datos),
+    solo sirve para comparar versiones y el informe no lleva ``train``.
+    """
+    start = time.perf_counter()
+    store = ModelStore(model_path)
+    _, _, X, _, missing = _load_dataset(model_path, hist_path)
+    folds = make_folds(len(X), n_folds, test_size, mode, train_size)
+    workers = workers or min(len(folds), os.cpu_count() or 1)
+    threads = max((os.cpu_count() or 1) // workers, 1)
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(str(model_path), str(hist_path), threads)) as pool:
+        results = list(pool.map(_run_fold, [(k, fold, refit) for k, fold in enumerate(folds)]))
+
+    wall = time.perf_counter() - start
+    test_rows = sum(r["test_rows"] for r in results)
+    predict_seconds = sum(r["predict_seconds"] for r in results)
+    return {
+        "model": str(model_path),
+        "model_version": store.version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "kind": "walk_forward" if refit else "version_comparison",
+        "config": {"n_folds": n_folds, "test_size": test_size, "mode": mode, "train_size": train_size,
+                   "refit": refit, "workers": workers, "threads_per_worker": threads},
+        # Variables que no están en el histórico (p. ej. temperaturas): valen 0.0
+        "missing_features": missing,
+        "folds": results,
+        "summary": {
+            "mae": float(np.mean([r["mae"] for r in results])),
+            "rmse": float(np.mean([r["rmse"] for r in results])),
+            "r2": float(np.mean([r["r2"] for r in results if r["r2"] is not None])),
+            "rows_per_second": test_rows / predict_seconds if predict_seconds > 0 else None,
+            "wall_seconds": wall,
+        },
+    }
+
+
+# -----------------------------------------
+# CLI
+# -----------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtesting walk-forward del modelo de demanda")
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Ruta del modelo, versión del registro (v0003) o 'latest'")
+    parser.add_argument("--data", default=str(HIST_PATH), help="Dataset histórico (CSV)")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--test-hours", type=int, default=24 * 30, help="Horas por bloque de test")
+    parser.add_argument("--mode", choices=["expanding", "sliding"], default="expanding")
+    parser.add_argument("--train-hours", type=int, default=None, help="Ventana de entrenamiento (modo sliding)")
+    parser.add_argument("--no-refit", dest="refit", action="store_false",
+                        help="No reentrenar: evaluar el modelo guardado en cada bloque (comparación de versiones)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo")
+    parser.add_argument("--output", default=None, help="Informe JSON (por defecto data/interim/backtest_<versión>.json)")
+    parser.add_argument("--compare", default=None, help="Informe anterior con el que comparar")
+    args = parser.parse_args(argv)
+
+    report = run_backtest(resolve_model(args.model), args.data, args.folds, args.test_hours, args.mode,
+                          args.train_hours, args.refit, args.workers)
+    output = Path(args.output) if args.output else REPORT_DIR / f"backtest_{report['model_version']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    if not report["config"]["refit"]:
+        print("Comparación de versiones (sin reentrenar): el modelo puede haber visto los bloques de test")
+    print(f"{'fold':>4} {'test':>25} {'MAE':>9} {'RMSE':>9} {'R2':>7} {'filas/s':>12}")
+    for r in report["folds"]:
+        print(f"{r['fold']:>4} {r['test'][0][:10]}..{r['test'][1][:10]:>12} {r['mae']:9.1f} {r['rmse']:9.1f} "
+              f"{r['r2'] if r['r2'] is not None else float('nan'):7.4f} {r['rows_per_second'] or 0:12,.0f}")
+    s = report["summary"]
+    print(f"Media: MAE {s['mae']:.1f} MW | RMSE {s['rmse']:.1f} MW | R2 {s['r2']:.4f} | "
+          f"{s['rows_per_second'] or 0:,.0f} filas/s | {s['wall_seconds']:.1f}s")
+    print(f"Informe: {output}")
+
+    if args.compare:
+        previous_report = json.loads(Path(args.compare).read_text())
+        previous = previous_report["summary"]
+        print(f"Frente a {args.compare}:")
+        if previous_report.get("config", {}).get("refit") != report["config"]["refit"]:
+            print("  Aviso: uno de los informes reentrena por fold y el otro no; las métricas no son comparables")
+        for key, label in [("mae", "MAE"), ("rmse", "RMSE"), ("rows_per_second", "filas/s"), ("wall_seconds", "tiempo")]:
+            if previous.get(key) and s.get(key):
+                print(f"  {label:>8}: {previous[key]:,.1f} -> {s[key]:,.1f} ({(s[key] / previous[key] - 1) * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
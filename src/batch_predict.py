@@ -0,0 +1,170 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from pathlib import Path
+import argparse
+import sys
+import time
+
+import pandas as pd
+
+from explain import contributions_frame
+from fast_predict import FastPredictor
+from model_store import ModelStore
+from registry import resolve_model
+from features import align_features
+
+BASE_DIR = Path().resolve()
+MODEL_PATH = BASE_DIR / "models" / "xgb_model.pkl"
+DEFAULT_CHUNKSIZE = 50_000
+PRED_COLUMN = "demanda_pred"
+
+
+# -----------------------------------------
+# LECTURA POR BLOQUES
+# -----------------------------------------
+def _is_parquet(path):
+    return Path(path).suffix.lower() in (".parquet", ".pq")
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Para leer o escribir Parquet hace falta instalar pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def count_rows(path):
+    """Número de filas del fichero sin cargarlo entero en memoria."""
+    if _is_parquet(path):
+        pa = _import_pyarrow()
+        return pa.parquet.ParquetFile(path).metadata.num_rows
+    lines = 0
+    last = b"\n"
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)  # sin la cabecera
+
+
+def iter_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Itera el fichero (CSV o Parquet) en DataFrames de como mucho ``chunksize`` filas."""
+    if _is_parquet(path):
+        pa = _import_pyarrow()
+        for batch in pa.parquet.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+# -----------------------------------------
+# ESCRITURA INCREMENTAL
+# -----------------------------------------
+class _ChunkWriter:
+    def __init__(self, path):
+        self.path = Path(path)
+        self._first = True
+        self._parquet = None
+
+    def write(self, df):
+        if _is_parquet(self.path):
+            pa = _import_pyarrow()
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pa.parquet.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            df.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        elif self._first:
+            # Entrada vacía: dejamos al menos el fichero creado
+            self.path.write_text("")
+
+
+# -----------------------------------------
+# PREDICCIÓN POR LOTES
+# -----------------------------------------
+def predict_file(model, input_path, output_path, chunksize=DEFAULT_CHUNKSIZE, progress=None,
+                 explain=False, approx=True):
+    """Predice todas las filas de ``input_path`` y las escribe en ``output_path``.
+
+    Las columnas se alinean con ``model.feature_names_in_`` (las que faltan
+    valen 0.0, como en la app) y cada bloque se predice en una sola llamada.
+    En memoria solo hay un bloque a la vez. ``progress(filas_hechas, total)``
+    se llama tras cada bloque. Devuelve un resumen con filas, tiempo y
+    columnas que faltaban en la entrada.
+
+    Con ``explain=True`` cada bloque se predice junto con sus contribuciones
+    por variable (columnas ``contrib_*``) en la misma llamada. Por defecto
+    son las aproximadas (``approx``): TreeSHAP exacto cuesta cientos de
+    veces más que ``predict`` por fila (``python src/explain.py``).
+    """
+    features = [str(col) for col in model.feature_names_in_]
+    predictor = FastPredictor(model) if explain else None
+    total = count_rows(input_path)
+    writer = _ChunkWriter(output_path)
+    missing = None
+    done = 0
+    start = time.perf_counter()
+    try:
+        for chunk in iter_chunks(input_path, chunksize):
+            if missing is None:
+                missing = [col for col in features if col not in chunk.columns]
+            X = align_features(chunk, features)
+            if predictor is None:
+                chunk[PRED_COLUMN] = model.predict(X)
+            else:
+                pred, contribs = predictor.explain(X.to_numpy(dtype="float32"), approx=approx)
+                chunk[PRED_COLUMN] = pred
+                chunk = pd.concat([chunk.reset_index(drop=True), contributions_frame(features, contribs)], axis=1)
+            writer.write(chunk)
+            done += len(chunk)
+            if progress is not None:
+                progress(done, total)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": done,
+        "seconds": elapsed,
+        "rows_per_second": done / elapsed if elapsed > 0 else None,
+        "missing_features": missing or [],
+    }
+
+
+# -----------------------------------------
+# CLI
+# -----------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Predicción de demanda por lotes (CSV o Parquet)")
+    parser.add_argument("input", help="Fichero de entrada con las variables del modelo")
+    parser.add_argument("output", help="Fichero de salida (.csv o .parquet)")
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Ruta del modelo, versión del registro (v0003) o 'latest'")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Filas por bloque")
+    parser.add_argument("--explain", action="store_true", help="Añadir las contribuciones por variable (contrib_*)")
+    parser.add_argument("--exact", action="store_true", help="Con --explain: TreeSHAP exacto en lugar del aproximado")
+    args = parser.parse_args(argv)
+
+    model = ModelStore(resolve_model(args.model)).get()
+
+    def progress(done, total):
+        print(f"\r{done:,}/{total:,} filas", end="", file=sys.stderr, flush=True)
+
+    summary = predict_file(model, args.input, args.output, args.chunksize, progress, args.explain, not args.exact)
+    print(file=sys.stderr)
+    if summary["missing_features"]:
+        print(f"Aviso: columnas ausentes rellenadas con 0.0: {summary['missing_features']}", file=sys.stderr)
+    print(f"{summary['rows']:,} filas en {summary['seconds']:.2f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from pathlib import Path
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = Path().resolve()
+
+# Se ejecuta en un proceso nuevo por medición para que el arranque sea en frío
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+eda = time.perf_counter() - t0
+heavy = sorted(m for m in ("pandas", "numpy", "joblib", "xgboost", "altair", "sklearn") if m in sys.modules)
+t1 = time.perf_counter()
+at.sidebar.radio[0].set_value("Predicción").run()
+pred = time.perf_counter() - t1
+print(json.dumps({"eda_s": eda, "prediccion_s": pred, "heavy_after_eda": heavy,
+                  "errors": [str(e.value) for e in at.exception]}))
+"""
+
+
+# -----------------------------------------
+# BENCHMARK DE ARRANQUE
+# -----------------------------------------
+def measure(app_path, runs=5):
+    """Tiempo hasta el primer render del EDA y hasta la primera Predicción (en frío)."""
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _PROBE, str(Path(app_path).resolve())],
+                             cwd=BASE_DIR, capture_output=True, text=True, check=True)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "app": str(app_path),
+        "runs": runs,
+        "eda_median_s": statistics.median(s["eda_s"] for s in samples),
+        "prediccion_median_s": statistics.median(s["prediccion_s"] for s in samples),
+        "heavy_after_eda": samples[-1]["heavy_after_eda"],
+        "errors": samples[-1]["errors"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tiempo hasta el primer render de la app (arranque en frío)")
+    parser.add_argument("apps", nargs="*", default=["app.py"], help="Scripts a comparar (p. ej. una versión anterior)")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    for app in args.apps:
+        r = measure(app, args.runs)
+        print(f"{r['app']}: primer render EDA {r['eda_median_s']:.2f}s | primera Predicción "
+              f"{r['prediccion_median_s']:.2f}s | importado tras EDA: {', '.join(r['heavy_after_eda']) or '-'}")
+        for error in r["errors"]:
+            print(f"  error: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from pathlib import Path
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from fast_predict import FastPredictor, sample_inputs
+from model_store import ModelStore
+from registry import resolve_model
+
+BASE_DIR = Path().resolve()
+MODEL_PATH = BASE_DIR / "models" / "xgb_model.pkl"
+BASE_COLUMN = "base"
+CONTRIB_PREFIX = "contrib_"
+
+
+# -----------------------------------------
+# CONTRIBUCIONES POR VARIABLE
+# -----------------------------------------
+def contributions_frame(features, contribs):
+    """DataFrame ``contrib_<variable>`` (+ ``contrib_base``) a partir de ``FastPredictor.explain``."""
+    columns = [f"{CONTRIB_PREFIX}{name}" for name in [*features, BASE_COLUMN]]
+    return pd.DataFrame(np.asarray(contribs), columns=columns)
+
+
+def waterfall(features, contribs_row, values=None, top=None):
+    """Tramos de la cascada de una predicción, de la base a la predicción final.
+
+    Las variables se ordenan por contribución absoluta; con ``top`` el resto
+    se agrupa en "Resto". Cada fila lleva ``inicio`` y ``fin`` (MW) para
+    dibujarla como barra flotante.
+    """
+    contribs_row = np.asarray(contribs_row, dtype=np.float64).ravel()
+    base, contribs = contribs_row[-1], contribs_row[:-1]
+    order = np.argsort(-np.abs(contribs))
+    rows = [(features[i], contribs[i], None if values is None else float(values[i])) for i in order]
+    if top is not None and len(rows) > top:
+        rest = sum(c for _, c, _ in rows[top:])
+        rows = rows[:top] + [("Resto", rest, None)]
+
+    tramos = [{"variable": "Base", "valor": None, "contribucion": base, "inicio": 0.0, "fin": base}]
+    acumulado = base
+    for name, contrib, value in rows:
+        tramos.append({"variable": name, "valor": value, "contribucion": contrib,
+                       "inicio": acumulado, "fin": acumulado + contrib})
+        acumulado += contrib
+    tramos.append({"variable": "Predicción", "valor": None, "contribucion": acumulado, "inicio": 0.0, "fin": acumulado})
+    return pd.DataFrame(tramos)
+
+
+# -----------------------------------------
+# BENCHMARK
+# -----------------------------------------
+def _timed(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def benchmark(model, sizes=(1, 64, 2000), seed=0):
+    """Coste de ``explain`` (exacto y aproximado) frente a ``predict`` por tamaño de llamada."""
+    predictor = FastPredictor(model)
+    inputs = sample_inputs(min(max(sizes), 5000), seed)
+    pool = np.vstack([predictor.row(values).copy() for values in inputs])
+    results = []
+    for n in sizes:
+        X = pool[np.arange(n) % len(pool)]
+        repeat = max(1, 200 // n)
+        predict_s = _timed(lambda: predictor.predict(X), repeat)
+        explain_s = _timed(lambda: predictor.explain(X), repeat)
+        approx_s = _timed(lambda: predictor.explain(X, approx=True), repeat)
+        pred, _ = predictor.explain(X)
+        results.append({
+            "rows": n,
+            "predict_ms": predict_s * 1000,
+            "explain_ms": explain_s * 1000,
+            "approx_ms": approx_s * 1000,
+            "overhead": explain_s / predict_s,
+            "approx_overhead": approx_s / predict_s,
+            "max_abs_diff": float(np.max(np.abs(pred - predictor.predict(X)))),
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Coste de las contribuciones TreeSHAP frente a predict")
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Ruta del modelo, versión del registro (v0003) o 'latest'")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 64, 2000], help="Filas por llamada")
+    args = parser.parse_args(argv)
+
+    for r in benchmark(ModelStore(resolve_model(args.model)).get(), args.sizes):
+        print(f"{r['rows']:>8,} filas: predict {r['predict_ms']:9.2f} ms | TreeSHAP {r['explain_ms']:9.2f} ms "
+              f"(x{r['overhead']:.0f}) | aproximado {r['approx_ms']:8.2f} ms (x{r['approx_overhead']:.1f}) "
+              f"| diferencia máxima {r['max_abs_diff']:.3g} MW")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from pathlib import Path
+import argparse
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import align_features
+from model_store import ModelStore
+from registry import resolve_model
+
+BASE_DIR = Path().resolve()
+MODEL_PATH = BASE_DIR / "models" / "xgb_model.pkl"
+
+
+# -----------------------------------------
+# PREDICTOR RÁPIDO DE UNA FILA
+# -----------------------------------------
+class FastPredictor:
+    """Predicción de una fila sin construir DataFrames.
+
+    El orden de variables se resuelve al crear el objeto y cada hilo reutiliza
+    su propia fila float32 preasignada, que se pasa directamente a
+    ``Booster.inplace_predict`` (sin la validación ni las conversiones del
+    wrapper de sklearn).
+    """
+
+    def __init__(self, model):
+        self.features = [str(col) for col in model.feature_names_in_]
+        self.index = {name: i for i, name in enumerate(self.features)}
+        self.booster = model.get_booster()
+        best_iteration = getattr(model, "best_iteration", None)
+        # Igual que XGBRegressor.predict: si hubo early stopping, hasta la mejor iteración
+        self.iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+        self._local = threading.local()
+
+    def row(self, values):
+        """Rellena la fila preasignada del hilo con ``values`` (dict) y la devuelve.
+
+        Las variables que no vienen en ``values`` valen 0.0, como en la app.
+        """
+        buffer = getattr(self._local, "row", None)
+        if buffer is None:
+            buffer = self._local.row = np.zeros((1, len(self.features)), dtype=np.float32)
+        else:
+            buffer.fill(0.0)
+        for name, value in values.items():
+            i = self.index.get(name)
+            if i is not None:
+                buffer[0, i] = value
+        return buffer
+
+    def predict(self, X):
+        """Predicciones para una matriz float32 con las columnas en ``self.features``."""
+        return self.booster.inplace_predict(X, iteration_range=self.iteration_range)
+
+    def predict_one(self, values):
+        return float(self.predict(self.row(values))[0])
+
+    def explain(self, X, approx=False):
+        """Predicciones y contribuciones TreeSHAP en la misma llamada al modelo.
+
+        Devuelve ``(pred, contribs)``: ``contribs`` tiene una columna por
+        variable (orden de ``self.features``) y el valor base al final, y
+        cada fila suma su predicción, así que no hace falta un ``predict``
+        aparte. Con ``approx=True`` se usa la aproximación de Saabas (un
+        recorrido por árbol, del orden de ``predict``) en lugar de TreeSHAP
+        exacto, que es mucho más caro por fila.
+        """
+        from xgboost import DMatrix
+
+        contribs = self.booster.predict(
+            DMatrix(X, feature_names=self.features), pred_contribs=True, approx_contribs=approx,
+            iteration_range=self.iteration_range,
+        )
+        return contribs.sum(axis=1, dtype=np.float64), contribs
+
+
+# -----------------------------------------
+# VERIFICACIÓN Y MICROBENCHMARK
+# -----------------------------------------
+def _app_path(model, values):
+    # Camino original de la app: DataFrame de una fila + alineación + predict
+    X_input = align_features(pd.DataFrame([values]), model.feature_names_in_)
+    return float(model.predict(X_input)[0])
+
+
+def sample_inputs(n, seed=0):
+    """Entradas aleatorias en los rangos de los controles de la app."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for _ in range(n):
+        dia_semana = int(rng.integers(1, 8))
+        rows.append({
+            "demanda_lag_1": int(rng.integers(240, 471)) * 100,
+            "demanda_lag_24": int(rng.integers(240, 471)) * 100,
+            "demanda_lag_168": int(rng.integers(240, 471)) * 100,
+            "media_movil_24h": int(rng.integers(240, 471)) * 100,
+            "hora": int(rng.integers(0, 24)),
+            "mes": int(rng.integers(1, 13)),
+            "es_finde": int(dia_semana >= 6),
+            "dia_semana": dia_semana,
+            "Madrid_temperature_2m": int(rng.integers(-15, 49)),
+            "Valencia_temperature_2m": int(rng.integers(-15, 49)),
+            "Pais_Vasco_temperature_2m": int(rng.integers(-15, 49)),
+            "Cataluna_temperature_2m": int(rng.integers(-15, 49)),
+            "Andalucia_temperature_2m": int(rng.integers(-15, 49)),
+        })
+    return rows
+
+
+def verify(model, inputs, fast=None):
+    """Diferencia máxima entre el camino rápido y el de la app."""
+    fast = fast or FastPredictor(model)
+    return max(abs(fast.predict_one(values) - _app_path(model, values)) for values in inputs)
+
+
+def benchmark(model, n=2000, seed=0):
+    fast = FastPredictor(model)
+    inputs = sample_inputs(n, seed)
+    fast.predict_one(inputs[0])
+    _app_path(model, inputs[0])
+
+    start = time.perf_counter()
+    for values in inputs:
+        _app_path(model, values)
+    app_us = (time.perf_counter() - start) / n * 1e6
+
+    start = time.perf_counter()
+    for values in inputs:
+        fast.predict_one(values)
+    fast_us = (time.perf_counter() - start) / n * 1e6
+
+    return {
+        "n": n,
+        "app_us_per_row": app_us,
+        "fast_us_per_row": fast_us,
+        "speedup": app_us / fast_us,
+        "max_abs_diff": verify(model, inputs[:200], fast),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmark del predictor rápido de una fila")
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Ruta del modelo, versión del registro (v0003) o 'latest'")
+    parser.add_argument("-n", type=int, default=2000, help="Número de predicciones")
+    args = parser.parse_args(argv)
+
+    result = benchmark(ModelStore(resolve_model(args.model)).get(), args.n)
+    print(f"Camino de la app:  {result['app_us_per_row']:8.1f} µs/predicción")
+    print(f"Predictor rápido:  {result['fast_us_per_row']:8.1f} µs/predicción")
+    print(f"Mejora: x{result['speedup']:.1f}  (diferencia máxima {result['max_abs_diff']:.3g} MW)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+import numpy as np
+import pandas as pd
+
+
+# -----------------------------------------
+# ESQUEMA DE VARIABLES
+# -----------------------------------------
+# Mismo orden que model.feature_names_in_
+LAG_COLUMNS = {
+    "demanda_lag_1": 1,
+    "demanda_lag_24": 24,
+    "demanda_lag_168": 168,
+}
+ROLLING_COLUMN = "media_movil_24h"
+ROLLING_WINDOW = 24
+CALENDAR_COLUMNS = ["hora", "mes", "es_finde", "dia_semana"]
+TEMP_COLUMNS = [
+    "Madrid_temperature_2m",
+    "Valencia_temperature_2m",
+    "Pais_Vasco_temperature_2m",
+    "Cataluna_temperature_2m",
+    "Andalucia_temperature_2m",
+]
+FEATURE_COLUMNS = [*LAG_COLUMNS, ROLLING_COLUMN, *CALENDAR_COLUMNS, *TEMP_COLUMNS]
+
+# Horas de historia necesarias para calcular las variables de una hora nueva
+HISTORY_HOURS = max(max(LAG_COLUMNS.values()), ROLLING_WINDOW)
+
+
+# -----------------------------------------
+# CALENDARIO
+# -----------------------------------------
+def calendar_columns(fechas):
+    """Variables de calendario como arrays NumPy.
+
+    ``dia_semana`` va de lunes=1 a domingo=7, como en la app (el notebook
+    usaba ``dayofweek``, de 0 a 6) y ``es_finde`` es 1 en sábado y domingo.
+    """
+    fechas = pd.DatetimeIndex(fechas)
+    dia_semana = fechas.weekday.to_numpy() + 1
+    return {
+        "hora": fechas.hour.to_numpy(),
+        "mes": fechas.month.to_numpy(),
+        "es_finde": (dia_semana >= 6).astype(np.int8),
+        "dia_semana": dia_semana,
+    }
+
+
+# -----------------------------------------
+# RECÁLCULO COMPLETO
+# -----------------------------------------
+def build_features(df):
+    """Calcula todas las variables del modelo sobre la serie completa.
+
+    ``df`` necesita ``fecha`` y ``demanda_real`` con una fila por hora. Los
+    retardos son ``shift(k)`` y ``media_movil_24h`` es la media de las 24
+    horas anteriores, ``shift(1).rolling(24).mean()``: lo que se conoce al
+    predecir, igual que ``LagState`` en el pronóstico y el slider de la app.
+    El notebook la calculaba incluyendo la hora actual (el valor a predecir);
+    el modelo original se entrenó así, los de ``train.py`` ya no. Las
+    primeras 168 horas quedan con NaN en los retardos.
+    """
+    df = df.copy()
+    df["fecha"] = pd.to_datetime(df["fecha"], utc=True)
+    df = df.sort_values("fecha", ignore_index=True)
+    for name, values in calendar_columns(df["fecha"]).items():
+        df[name] = values
+    demanda = df["demanda_real"]
+    for name, k in LAG_COLUMNS.items():
+        df[name] = demanda.shift(k)
+    df[ROLLING_COLUMN] = demanda.shift(1).rolling(window=ROLLING_WINDOW).mean()
+    return df
+
+
+# -----------------------------------------
+# MODO INCREMENTAL
+# -----------------------------------------
+def append_features(previous, new_rows):
+    """Calcula las variables solo para ``new_rows`` y las añade a ``previous``.
+
+    ``previous`` es la salida de ``build_features``/``append_features`` y
+    ``new_rows`` las horas nuevas (``fecha``, ``demanda_real`` y el resto de
+    columnas que traigan), posteriores a la última de ``previous``. Solo se
+    usan las últimas ``HISTORY_HOURS`` demandas de ``previous``, así que el
+    coste depende del número de horas nuevas y no del tamaño del histórico.
+    """
+    new = compute_new_rows(previous["demanda_real"].to_numpy()[-HISTORY_HOURS:], new_rows)
+    return pd.concat([previous, new], ignore_index=True)
+
+
+def compute_new_rows(history, new_rows):
+    """Variables de ``new_rows`` a partir de las demandas previas ``history``."""
+    new = new_rows.copy()
+    new["fecha"] = pd.to_datetime(new["fecha"], utc=True)
+    new = new.sort_values("fecha", ignore_index=True)
+    for name, values in calendar_columns(new["fecha"]).items():
+        new[name] = values
+
+    history = np.asarray(history, dtype=np.float64)[-HISTORY_HOURS:]
+    demanda = np.concatenate([history, new["demanda_real"].to_numpy(dtype=np.float64)])
+    offset = len(history)
+    positions = np.arange(offset, len(demanda))
+    for name, k in LAG_COLUMNS.items():
+        src = positions - k
+        new[name] = np.where(src >= 0, demanda[np.maximum(src, 0)], np.nan)
+
+    # Media de las 24 horas anteriores con suma acumulada sobre la ventana
+    # corta (historia + nuevas); la hora actual no entra
+    cumsum = np.concatenate([[0.0], np.cumsum(demanda)])
+    start = positions - ROLLING_WINDOW
+    new[ROLLING_COLUMN] = np.where(
+        start >= 0,
+        (cumsum[positions] - cumsum[np.maximum(start, 0)]) / ROLLING_WINDOW,
+        np.nan,
+    )
+    return new
+
+
+# -----------------------------------------
+# ALINEACIÓN CON EL MODELO
+# -----------------------------------------
+def align_features(df, feature_names=FEATURE_COLUMNS):
+    """Reordena las columnas como espera el modelo; las que faltan valen 0.0."""
+    return df.reindex(columns=[str(col) for col in feature_names], fill_value=0.0)
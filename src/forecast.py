@@ -0,0 +1,104 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+import numpy as np
+import pandas as pd
+
+from fast_predict import FastPredictor
+from features import HISTORY_HOURS, ROLLING_WINDOW, calendar_columns
+
+LAG_WINDOW = HISTORY_HOURS  # hace 7 días: el retardo más largo que usa el modelo
+
+
+# -----------------------------------------
+# ESTADO DE RETARDOS (BUFFER CIRCULAR)
+# -----------------------------------------
+class LagState:
+    """Últimas 168 demandas horarias en un buffer circular.
+
+    ``push`` es O(1): sobrescribe la posición más antigua y actualiza la suma
+    de las últimas 24 horas restando el valor que sale de la ventana.
+    """
+
+    def __init__(self, history):
+        history = np.asarray(history, dtype=np.float64)
+        if len(history) < LAG_WINDOW:
+            raise ValueError(f"Hacen falta al menos {LAG_WINDOW} horas de demanda y hay {len(history)}")
+        self._buffer = history[-LAG_WINDOW:].copy()
+        self._pos = 0  # siguiente posición a escribir (= la más antigua)
+        self._rolling_sum = float(self._buffer[-ROLLING_WINDOW:].sum())
+
+    def lag(self, k):
+        """Demanda de hace ``k`` horas (1 <= k <= 168)."""
+        return self._buffer[(self._pos - k) % LAG_WINDOW]
+
+    @property
+    def rolling_mean(self):
+        return self._rolling_sum / ROLLING_WINDOW
+
+    def push(self, value):
+        self._rolling_sum += value - self.lag(ROLLING_WINDOW)
+        self._buffer[self._pos] = value
+        self._pos = (self._pos + 1) % LAG_WINDOW
+
+
+# -----------------------------------------
+# PRONÓSTICO RECURSIVO
+# -----------------------------------------
+class RecursiveForecaster:
+    """Pronóstico de varias horas realimentando cada predicción como retardo.
+
+    Las variables de calendario y temperatura de todo el horizonte se
+    construyen de una vez en una matriz NumPy; en cada paso solo se rellenan
+    las cuatro columnas de demanda de la fila y se predice esa fila con
+    ``FastPredictor``, sin construir DataFrames. ``media_movil_24h`` es la
+    media de las 24 horas anteriores (reales o ya pronosticadas), igual que
+    el slider de la app.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._fast = FastPredictor(model)
+        self.features = self._fast.features
+        self._col = {name: i for i, name in enumerate(self.features)}
+
+    def build_exogenous(self, start, horizon, temperatures=None):
+        """Matriz ``horizon x n_features`` con calendario y temperaturas rellenos."""
+        fechas = pd.date_range(start, periods=horizon, freq="h")
+        X = np.zeros((horizon, len(self.features)), dtype=np.float32)
+        for name, values in calendar_columns(fechas).items():
+            if name in self._col:
+                X[:, self._col[name]] = values
+        for name, values in (temperatures or {}).items():
+            if name in self._col:
+                # Escalar (constante en todo el horizonte) o un valor por hora
+                X[:, self._col[name]] = np.broadcast_to(np.asarray(values, dtype=np.float32), horizon)
+        return fechas, X
+
+    def forecast(self, history, start, horizon=24, temperatures=None):
+        """Pronostica ``horizon`` horas a partir de ``start``.
+
+        ``history`` son las demandas horarias reales inmediatamente anteriores
+        a ``start`` (al menos 168). ``temperatures`` mapea cada columna de
+        temperatura a un escalar o a un array de longitud ``horizon``.
+        """
+        state = LagState(history)
+        fechas, X = self.build_exogenous(start, horizon, temperatures)
+        lag_cols = [
+            (self._col.get("demanda_lag_1"), 1),
+            (self._col.get("demanda_lag_24"), 24),
+            (self._col.get("demanda_lag_168"), 168),
+        ]
+        mean_col = self._col.get("media_movil_24h")
+        preds = np.empty(horizon, dtype=np.float64)
+        for step in range(horizon):
+            row = X[step:step + 1]
+            for col, k in lag_cols:
+                if col is not None:
+                    row[0, col] = state.lag(k)
+            if mean_col is not None:
+                row[0, mean_col] = state.rolling_mean
+            pred = float(self._fast.predict(row)[0])
+            preds[step] = pred
+            state.push(pred)
+        return pd.DataFrame({"fecha": fechas, "demanda_pred": preds})
@@ -0,0 +1,236 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from pathlib import Path
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import TEMP_COLUMNS
+from forecast import LAG_WINDOW, RecursiveForecaster
+from history import HistoricalStore
+from ingest_weather import WEATHER_DIR, load_weather
+from model_store import ModelStore
+from registry import resolve_model
+
+BASE_DIR = Path().resolve()
+MODEL_PATH = BASE_DIR / "models" / "xgb_model.pkl"
+HIST_PATH = BASE_DIR / "data" / "processed" / "dataset_consulta.csv"
+FORECAST_DIR = BASE_DIR / "data" / "interim" / "forecast"
+LATEST_FILE = "latest.json"
+DEFAULT_HORIZON = 24
+DEFAULT_INTERVAL = 30.0
+
+
+# -----------------------------------------
+# CÁLCULO DEL PRONÓSTICO
+# -----------------------------------------
+def persistence_temperatures(weather, start, horizon):
+    """Temperaturas del horizonte repitiendo las de las últimas 24 horas conocidas.
+
+    Devuelve ``(temperaturas, origen)``. Sin temperaturas ingeridas se usa
+    0.0, como hace la app con las variables que faltan.
+    """
+    if weather is None:
+        return {}, "ninguna"
+    known = weather[weather["fecha"] < start].tail(24)
+    temps = {}
+    for col in TEMP_COLUMNS:
+        if col in known and known[col].notna().any():
+            last_day = known[col].ffill().bfill().to_numpy(dtype=np.float32)
+            temps[col] = np.resize(last_day, horizon)
+    return temps, "persistencia_24h" if temps else "ninguna"
+
+
+def compute_forecast(model_store, history_store, horizon=DEFAULT_HORIZON, weather_dir=WEATHER_DIR):
+    """Pronóstico de las ``horizon`` horas siguientes al último dato real, listo para publicar."""
+    start_time = time.perf_counter()
+    data_version = history_store.data_version
+    model = model_store.get()
+    model_version = model_store.version
+    last, demandas = history_store.latest_demand(LAG_WINDOW)
+    start = last + pd.Timedelta(hours=1)
+    temps, temp_source = persistence_temperatures(load_weather(weather_dir), start, horizon)
+    result = RecursiveForecaster(model).forecast(demandas, start, horizon, temps)
+    return {
+        "version": f"{data_version}-{model_version}",
+        "data_version": data_version,
+        "model_version": model_version,
+        "generated_at": time.time(),
+        "data_last_fecha": last.isoformat(),
+        "horizon": horizon,
+        "temperature_source": temp_source,
+        "compute_seconds": time.perf_counter() - start_time,
+        "forecast": [
+            {"fecha": fecha.isoformat(), "demanda_pred": float(pred)}
+            for fecha, pred in zip(result["fecha"], result["demanda_pred"])
+        ],
+    }
+
+
+# -----------------------------------------
+# CACHÉ COMPARTIDA Y VERSIONADA
+# -----------------------------------------
+class ForecastCache:
+    """Pronósticos publicados en disco, legibles desde cualquier proceso.
+
+    Cada publicación se guarda como ``forecast_<versión>.json`` (la versión
+    combina los datos y el modelo usados) y ``latest.json`` se sustituye de
+    forma atómica. ``read()`` solo hace un ``stat`` por llamada y reutiliza
+    el JSON ya leído mientras no cambie, así que leer el pronóstico no
+    cuesta trabajo de modelo ni de disco en la ruta de la petición.
+    """
+
+    def __init__(self, root=FORECAST_DIR, keep=24):
+        self.root = Path(root)
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._payload = None
+        self._mtime = None
+
+    def publish(self, payload):
+        self.root.mkdir(parents=True, exist_ok=True)
+        body = json.dumps(payload, indent=2)
+        versioned = self.root / f"forecast_{payload['version']}.json"
+        for target in (versioned, self.root / LATEST_FILE):
+            tmp = target.with_name(f".{target.name}.tmp")
+            tmp.write_text(body)
+            os.replace(tmp, target)
+        self._prune()
+        return versioned
+
+    def read(self):
+        """Último pronóstico publicado, o None si aún no hay ninguno."""
+        path = self.root / LATEST_FILE
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if mtime != self._mtime:
+                self._payload = json.loads(path.read_text())
+                self._mtime = mtime
+            return self._payload
+
+    def versions(self):
+        files = sorted(self.root.glob("forecast_*.json"), key=lambda p: p.stat().st_mtime_ns)
+        return [p.stem.removeprefix("forecast_") for p in files]
+
+    def _prune(self):
+        files = sorted(self.root.glob("forecast_*.json"), key=lambda p: p.stat().st_mtime_ns)
+        for old in files[:-self.keep]:
+            old.unlink(missing_ok=True)
+
+
+def freshness(payload, history_store=None, model_store=None):
+    """Antigüedad del pronóstico y si quedan datos o modelo más nuevos sin usar."""
+    now = time.time()
+    last = pd.Timestamp(payload["data_last_fecha"])
+    report = {
+        "version": payload["version"],
+        "age_seconds": now - payload["generated_at"],
+        "data_last_fecha": payload["data_last_fecha"],
+        "hours_since_last_actual": (pd.Timestamp.now(tz="UTC") - last) / pd.Timedelta(hours=1),
+    }
+    if history_store is not None:
+        report["up_to_date"] = payload["data_version"] == history_store.data_version
+        if model_store is not None:
+            report["up_to_date"] = report["up_to_date"] and payload["model_version"] == model_store.version
+    return report
+
+
+# -----------------------------------------
+# PLANIFICADOR EN SEGUNDO PLANO
+# -----------------------------------------
+class ForecastScheduler(threading.Thread):
+    """Hilo que recalcula el pronóstico cuando llegan datos reales o cambia el modelo.
+
+    Cada ``interval`` segundos compara la versión de los datos y del modelo
+    con la del último pronóstico publicado (un par de ``stat``); solo si
+    alguna ha cambiado se vuelve a pronosticar y publicar.
+    """
+
+    def __init__(self, model_store, history_store, cache, horizon=DEFAULT_HORIZON,
+                 interval=DEFAULT_INTERVAL, weather_dir=WEATHER_DIR):
+        super().__init__(name="forecast-scheduler", daemon=True)
+        self.model_store = model_store
+        self.history_store = history_store
+        self.cache = cache
+        self.horizon = horizon
+        self.interval = interval
+        self.weather_dir = weather_dir
+        self._stop_event = threading.Event()
+        self.runs = 0
+        self.checks = 0
+        self.last_error = None
+
+    def tick(self):
+        """Una comprobación; devuelve True si se ha publicado un pronóstico nuevo."""
+        self.checks += 1
+        current = self.cache.read()
+        version = f"{self.history_store.data_version}-{self.model_store.version}"
+        if current is not None and current["version"] == version and current["horizon"] == self.horizon:
+            return False
+        payload = compute_forecast(self.model_store, self.history_store, self.horizon, self.weather_dir)
+        self.cache.publish(payload)
+        self.runs += 1
+        return True
+
+    def run(self):
+        while True:
+            try:
+                self.tick()
+                self.last_error = None
+            except Exception as exc:
+                # Un fallo (p. ej. un fichero a medio escribir) no para el hilo
+                self.last_error = f"{type(exc).__name__}: {exc}"
+            if self._stop_event.wait(self.interval):
+                return
+
+    def stop(self):
+        self._stop_event.set()
+
+    def stats(self):
+        return {"runs": self.runs, "checks": self.checks, "interval": self.interval,
+                "horizon": self.horizon, "last_error": self.last_error}
+
+
+# -----------------------------------------
+# CLI
+# -----------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precalcula el pronóstico de las próximas horas cuando llegan datos nuevos")
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Ruta del modelo, versión del registro (v0003) o 'latest'")
+    parser.add_argument("--data", default=str(HIST_PATH), help="Dataset histórico (CSV de origen de la caché)")
+    parser.add_argument("--out", default=str(FORECAST_DIR))
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON)
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="Segundos entre comprobaciones")
+    parser.add_argument("--once", action="store_true", help="Una sola comprobación y salir")
+    args = parser.parse_args(argv)
+
+    store = ModelStore(resolve_model(args.model))
+    history = HistoricalStore(args.data, check_interval=0.0)
+    cache = ForecastCache(args.out)
+    scheduler = ForecastScheduler(store, history, cache, args.horizon, args.interval)
+    if args.once:
+        published = scheduler.tick()
+        report = freshness(cache.read(), history, store)
+        print(f"{'Publicado' if published else 'Sin cambios'}: versión {report['version']} "
+              f"(último dato real {report['data_last_fecha']})")
+        return
+    print(f"Comprobando cada {args.interval:g}s; pronósticos en {args.out}")
+    scheduler.start()
+    try:
+        while scheduler.is_alive():
+            scheduler.join(timeout=1.0)
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
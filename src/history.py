@@ -0,0 +1,338 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from pathlib import Path
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# Tipos compactos con los que se guarda cada columna de la caché
+CACHE_DTYPES = {
+    "fecha": "int64",  # segundos desde epoch (UTC)
+    "year": "int16",
+    "mes": "int8",
+    "dia_semana": "int8",  # lunes=1 ... domingo=7, igual que en la app
+    "hora": "int8",
+    "es_finde": "int8",
+    "demanda_real": "float32",
+}
+CACHE_VERSION = 2
+
+
+# -----------------------------------------
+# ALMACÉN HISTÓRICO COLUMNAR
+# -----------------------------------------
+class HistoricalStore:
+    """Dataset histórico en caché columnar con índice (year, mes, dia_semana, hora).
+
+    La primera vez convierte ``dataset_consulta.csv`` a un ``.npy`` por columna
+    con tipos reducidos (``<csv>_cache/``); después abre esas columnas con
+    ``mmap_mode="r"``, de modo que los procesos que comparten la caché no
+    duplican memoria. Si el CSV cambia (mtime/tamaño) la caché se regenera,
+    y si otro proceso añade horas (``meta.json`` cambia) se vuelve a abrir.
+
+    Las horas añadidas con ``append`` (p. ej. desde la base de datos) no
+    están en el CSV: se guardan también en ``<csv>_appended/`` y cada
+    regeneración de la caché las vuelve a incorporar.
+    """
+
+    def __init__(self, csv_path, cache_dir=None, check_interval=5.0):
+        self.csv_path = Path(csv_path)
+        self.cache_dir = Path(cache_dir) if cache_dir else self.csv_path.with_name(self.csv_path.stem + "_cache")
+        self.appended_dir = self.csv_path.with_name(self.csv_path.stem + "_appended")
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._columns = None
+        self._index = None
+        self._first_year = None
+        self._source_sig = None
+        self._meta_sig = None
+        self._last_check = 0.0
+
+    # -----------------------------
+    # API pública
+    # -----------------------------
+    @property
+    def columns(self):
+        """Diccionario nombre -> array (memmap) con todas las columnas."""
+        self._ensure_loaded()
+        return self._columns
+
+    @property
+    def years(self):
+        self._ensure_loaded()
+        return list(range(self._first_year, self._first_year + self._index.shape[0]))
+
+    def __len__(self):
+        return len(self.columns["fecha"])
+
+    @property
+    def data_version(self):
+        """Identificador de los datos cargados: cambia al llegar horas nuevas."""
+        fecha = self.columns["fecha"]
+        return f"{len(fecha)}-{int(fecha[-1]) if len(fecha) else 0}"
+
+    def lookup(self, year, mes, dia_semana, hora):
+        """Demanda real de la primera hora que coincide, o None si no hay datos."""
+        self._ensure_loaded()
+        y = int(year) - self._first_year
+        if not 0 <= y < self._index.shape[0]:
+            return None
+        row = self._index[y, int(mes) - 1, int(dia_semana) - 1, int(hora)]
+        if row < 0:
+            return None
+        return float(self._columns["demanda_real"][row])
+
+    def lookup_years(self, mes, dia_semana, hora):
+        """Demanda real por año (todos los años del dataset) para mes/día/hora."""
+        self._ensure_loaded()
+        rows = self._index[:, int(mes) - 1, int(dia_semana) - 1, int(hora)]
+        demanda = self._columns["demanda_real"]
+        return {
+            self._first_year + i: (float(demanda[row]) if row >= 0 else None)
+            for i, row in enumerate(rows)
+        }
+
+    def latest_demand(self, hours):
+        """Última fecha del histórico y las ``hours`` demandas horarias más recientes."""
+        cols = self.columns
+        last = pd.Timestamp(int(cols["fecha"][-1]), unit="s", tz="UTC")
+        return last, np.asarray(cols["demanda_real"][-hours:], dtype=np.float64)
+
+    def to_frame(self):
+        """DataFrame con las columnas de la caché (``fecha`` como datetime UTC)."""
+        df = pd.DataFrame({name: np.asarray(col) for name, col in self.columns.items()})
+        df["fecha"] = pd.to_datetime(df["fecha"], unit="s", utc=True)
+        return df
+
+    # -----------------------------
+    # Carga y conversión
+    # -----------------------------
+    def _ensure_loaded(self):
+        now = time.monotonic()
+        if self._columns is not None and now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            self._last_check = now
+            sig = _source_signature(self.csv_path)
+            meta_sig = _source_signature(self.cache_dir / "meta.json")
+            if self._columns is not None and sig == self._source_sig and meta_sig == self._meta_sig:
+                return
+            meta = self._read_meta()
+            if meta is None or (sig is not None and meta.get("source") != sig):
+                if sig is None:
+                    raise FileNotFoundError(f"No se encontró el dataset histórico en: {self.csv_path}")
+                self._build_cache(sig)
+            self._open_cache()
+            self._source_sig = sig
+            self._meta_sig = _source_signature(self.cache_dir / "meta.json")
+
+    def _read_meta(self):
+        try:
+            meta = json.loads((self.cache_dir / "meta.json").read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        if meta.get("version") != CACHE_VERSION:
+            return None
+        return meta
+
+    def _build_cache(self, sig):
+        df = pd.read_csv(self.csv_path, usecols=["fecha", "year", "mes", "hora", "es_finde", "demanda_real"])
+        fecha = pd.to_datetime(df["fecha"], utc=True)
+        columns = {
+            "fecha": ((fecha - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)).to_numpy(),
+            "year": df["year"].to_numpy(),
+            "mes": df["mes"].to_numpy(),
+            "dia_semana": fecha.dt.weekday.to_numpy() + 1,
+            "hora": df["hora"].to_numpy(),
+            "es_finde": df["es_finde"].to_numpy(),
+            "demanda_real": df["demanda_real"].to_numpy(),
+        }
+        appended = read_columns(self.appended_dir)
+        if appended:
+            # Horas añadidas que el CSV no trae (si el CSV ya las tiene, manda el CSV);
+            # ante fechas repetidas vale la última añadida
+            fecha = np.asarray(appended["fecha"])
+            _, last = np.unique(fecha[::-1], return_index=True)
+            keep = np.sort(len(fecha) - 1 - last)
+            keep = keep[~np.isin(fecha[keep], columns["fecha"])]
+            columns = _concat_columns(columns, {name: np.asarray(col)[keep] for name, col in appended.items()})
+            order = np.argsort(columns["fecha"], kind="stable")
+            if np.any(order != np.arange(len(order))):
+                columns = {name: col[order] for name, col in columns.items()}
+        write_columns(self.cache_dir, columns, {"source": sig, "rows": len(columns["fecha"])})
+
+    def _open_cache(self, meta=None):
+        meta = meta or self._read_meta()
+        self._columns = read_columns(self.cache_dir, meta)
+        self._build_index()
+
+    # -----------------------------
+    # Altas incrementales
+    # -----------------------------
+    def append(self, df):
+        """Añade horas nuevas (``fecha``, ``demanda_real`` y opcionalmente temperaturas).
+
+        Las variables de calendario se derivan de ``fecha``. Las columnas que
+        no vengan en ``df`` (o que no existieran antes) se rellenan con NaN, y
+        las horas que ya estaban se ignoran. Devuelve las horas añadidas.
+        Cada columna se reescribe completa y se renombra de forma atómica:
+        con datos horarios son pocos MB. Si la caché no existe (sin CSV de
+        origen) se crea. Las horas se guardan antes en ``<csv>_appended/``
+        para que sobrevivan a una regeneración de la caché.
+        """
+        if df.empty:
+            return 0
+        fecha = pd.to_datetime(df["fecha"], utc=True)
+        new = {
+            "fecha": ((fecha - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)).to_numpy(),
+            "year": fecha.dt.year.to_numpy(),
+            "mes": fecha.dt.month.to_numpy(),
+            "dia_semana": fecha.dt.weekday.to_numpy() + 1,
+            "hora": fecha.dt.hour.to_numpy(),
+            "es_finde": (fecha.dt.weekday >= 5).to_numpy(),
+            **{col: df[col].to_numpy() for col in df.columns if col not in ("fecha", "year", "mes", "dia_semana", "hora", "es_finde")},
+        }
+        with self._lock:
+            meta = self._read_meta()
+            if meta is None:
+                if _source_signature(self.csv_path) is not None:
+                    # Primero convertimos el CSV para no perder el histórico
+                    self._build_cache(_source_signature(self.csv_path))
+                    meta = self._read_meta()
+            old = read_columns(self.cache_dir, meta) if meta is not None else read_columns(self.appended_dir)
+            if old:
+                # Horas que ya están (p. ej. un bloque que se añadió justo antes
+                # de cortarse una sincronización) no se duplican
+                fresh = ~np.isin(new["fecha"], np.asarray(old["fecha"]))
+                if not fresh.all():
+                    new = {name: np.asarray(col)[fresh] for name, col in new.items()}
+            n_new = len(new["fecha"])
+            if n_new == 0:
+                return 0
+            appended = _concat_columns(read_columns(self.appended_dir), new)
+            write_columns(self.appended_dir, appended, {"rows": len(appended["fecha"])})
+            if meta is None:
+                # Sin CSV ni caché: la caché son todas las horas añadidas
+                columns = appended
+            else:
+                columns = _concat_columns(old, new)
+            source = meta.get("source") if meta else _source_signature(self.csv_path)
+            write_columns(self.cache_dir, columns, {"source": source, "rows": len(columns["fecha"])})
+            self._open_cache()
+            self._source_sig = _source_signature(self.csv_path)
+            self._meta_sig = _source_signature(self.cache_dir / "meta.json")
+            self._last_check = time.monotonic()
+        return n_new
+
+    def _build_index(self):
+        # Índice denso years x 12 x 7 x 24 con la fila de la primera coincidencia
+        # (-1 si no hay datos): la consulta es un acceso directo al array
+        cols = self._columns
+        year = np.asarray(cols["year"], dtype=np.int64)
+        first_year = int(year.min()) if len(year) else 0
+        n_years = int(year.max()) - first_year + 1 if len(year) else 0
+        index = np.full((n_years, 12, 7, 24), -1, dtype=np.int32)
+        if len(year):
+            keys = np.ravel_multi_index(
+                (
+                    year - first_year,
+                    np.asarray(cols["mes"], dtype=np.int64) - 1,
+                    np.asarray(cols["dia_semana"], dtype=np.int64) - 1,
+                    np.asarray(cols["hora"], dtype=np.int64),
+                ),
+                index.shape,
+            )
+            unique_keys, first_rows = np.unique(keys, return_index=True)
+            index.ravel()[unique_keys] = first_rows
+        self._index = index
+        self._first_year = first_year
+
+
+# -----------------------------------------
+# UTILIDADES
+# -----------------------------------------
+def write_columns(cache_dir, columns, meta):
+    """Escribe un ``.npy`` por columna (con tipo reducido) y ``meta.json``.
+
+    Cada escritura es una generación nueva de ficheros (``fecha.<n>.npy``)
+    que no pisa la anterior, y ``meta.json``, que dice qué ficheros forman
+    la caché, se renombra al final: quien lea ``meta.json`` ve las columnas
+    de una misma escritura. Se conserva la generación anterior para los
+    lectores que acaban de leer el ``meta.json`` previo; las más antiguas se
+    borran (en POSIX, los mmap ya abiertos siguen siendo válidos).
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        previous = json.loads((cache_dir / "meta.json").read_text())
+    except (FileNotFoundError, ValueError):
+        previous = {}
+    generation = previous.get("generation", 0) + 1
+    dtypes, files = {}, {}
+    for name, values in columns.items():
+        arr = np.ascontiguousarray(values, dtype=CACHE_DTYPES.get(name, "float32"))
+        files[name] = f"{name}.{generation}.npy"
+        tmp = cache_dir / f".{files[name]}.tmp"
+        with open(tmp, "wb") as fh:
+            np.save(fh, arr)
+        os.replace(tmp, cache_dir / files[name])
+        dtypes[name] = str(arr.dtype)
+    meta = {"version": CACHE_VERSION, "dtypes": dtypes, "files": files, "generation": generation, **meta}
+    tmp = cache_dir / ".meta.json.tmp"
+    tmp.write_text(json.dumps(meta, indent=2))
+    os.replace(tmp, cache_dir / "meta.json")
+
+    keep = {*files.values(), *(_column_file(previous, name) for name in previous.get("dtypes", {}))}
+    for path in cache_dir.glob("*.npy"):
+        if path.name not in keep:
+            path.unlink(missing_ok=True)
+
+
+def read_columns(cache_dir, meta=None):
+    """Columnas (mmap) de un directorio escrito con ``write_columns``; {} si no existe."""
+    if meta is None:
+        try:
+            meta = json.loads((Path(cache_dir) / "meta.json").read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+    return {name: np.load(Path(cache_dir) / _column_file(meta, name), mmap_mode="r") for name in meta["dtypes"]}
+
+
+def _column_file(meta, name):
+    # Las cachés anteriores a las generaciones guardaban ``<columna>.npy``
+    return meta.get("files", {}).get(name, f"{name}.npy")
+
+
+def _concat_columns(old, new):
+    """Une dos conjuntos de columnas; las que falten en uno se rellenan con NaN."""
+    n_old = len(next(iter(old.values()))) if old else 0
+    n_new = len(next(iter(new.values()))) if new else 0
+    columns = {}
+    for name in dict.fromkeys([*old, *new]):
+        prev = old.get(name)
+        add = new.get(name)
+        if prev is None:
+            if n_old == 0:
+                # Sin filas previas manda el tipo de las nuevas (p. ej. ``fecha``
+                # en int64, que en float32 perdería segundos)
+                columns[name] = np.asarray(add)
+                continue
+            prev = np.full(n_old, np.nan, dtype=np.float32)
+        if add is None:
+            add = np.full(n_new, np.nan, dtype=np.float32)
+        columns[name] = np.concatenate([np.asarray(prev), np.asarray(add).astype(prev.dtype, copy=False)])
+    return columns
+
+
+def _source_signature(path):
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
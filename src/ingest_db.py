@@ -0,0 +1,116 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from pathlib import Path
+import argparse
+import json
+import os
+import re
+import time
+
+import pandas as pd
+from sqlalchemy import text
+
+from features import TEMP_COLUMNS
+from history import HistoricalStore
+from utils import db_connect
+
+BASE_DIR = Path().resolve()
+HIST_PATH = BASE_DIR / "data" / "processed" / "dataset_consulta.csv"
+STATE_PATH = BASE_DIR / "data" / "processed" / "ingest_state.json"
+DEFAULT_TABLE = "demanda_horaria"
+DEFAULT_CHUNKSIZE = 50_000
+
+
+# -----------------------------------------
+# MARCA DE AGUA
+# -----------------------------------------
+def read_watermark(state_path, table):
+    try:
+        state = json.loads(Path(state_path).read_text())
+    except FileNotFoundError:
+        return None
+    return state.get(table, {}).get("last_fecha")
+
+
+def write_watermark(state_path, table, last_fecha, rows):
+    state_path = Path(state_path)
+    try:
+        state = json.loads(state_path.read_text())
+    except FileNotFoundError:
+        state = {}
+    entry = state.setdefault(table, {"rows": 0})
+    entry.update(last_fecha=last_fecha, rows=entry.get("rows", 0) + rows, synced_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = state_path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2))
+    os.replace(tmp, state_path)
+
+
+def initial_watermark(store):
+    """Última fecha ya presente en el almacén: desde ahí continúa la sincronización."""
+    try:
+        last, _ = store.latest_demand(1)
+    except FileNotFoundError:
+        return None
+    return str(last)
+
+
+# -----------------------------------------
+# SINCRONIZACIÓN
+# -----------------------------------------
+def sync(engine, store, table=DEFAULT_TABLE, state_path=STATE_PATH, chunksize=DEFAULT_CHUNKSIZE):
+    """Trae de ``table`` solo las horas posteriores a las que ya tiene el almacén.
+
+    La consulta se lee por bloques de ``chunksize`` filas con cursor en el
+    servidor (``stream_results``) y cada bloque se añade al almacén
+    histórico. El punto de partida es la última ``fecha`` del propio
+    almacén, no la marca de agua guardada (que queda como registro): si el
+    proceso muere entre añadir un bloque y guardar la marca, o la caché se
+    regenera sin las horas añadidas, la siguiente sincronización continúa
+    exactamente donde se quedó, sin duplicar ni perder horas.
+    """
+    if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_.]*", table):
+        raise ValueError(f"Nombre de tabla no válido: {table}")
+    watermark = initial_watermark(store)
+    if watermark is None:
+        query = text(f"SELECT * FROM {table} ORDER BY fecha")
+        params = {}
+    else:
+        query = text(f"SELECT * FROM {table} WHERE fecha > :watermark ORDER BY fecha")
+        params = {"watermark": watermark}
+
+    total = 0
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True)
+        for chunk in pd.read_sql(query, conn, params=params, chunksize=chunksize):
+            if chunk.empty:
+                continue
+            last_fecha = str(chunk["fecha"].iloc[-1])
+            keep = ["fecha", "demanda_real", *[col for col in TEMP_COLUMNS if col in chunk.columns]]
+            added = store.append(chunk[keep])
+            write_watermark(state_path, table, last_fecha, added)
+            total += added
+    return total
+
+
+# -----------------------------------------
+# CLI
+# -----------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sincroniza la demanda horaria de la base de datos con data/processed")
+    parser.add_argument("--url", default=None, help="URL de la base de datos (por defecto DATABASE_URL)")
+    parser.add_argument("--table", default=DEFAULT_TABLE)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--data", default=str(HIST_PATH), help="Dataset histórico (CSV de origen de la caché)")
+    parser.add_argument("--state", default=str(STATE_PATH), help="Fichero con la marca de agua")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    rows = sync(db_connect(args.url), HistoricalStore(args.data), args.table, args.state, args.chunksize)
+    print(f"{rows:,} filas nuevas en {time.perf_counter() - start:.2f}s "
+          f"(marca de agua: {read_watermark(args.state, args.table)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+import argparse
+import io
+import os
+import time
+import unicodedata
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from features import TEMP_COLUMNS
+from history import HistoricalStore, read_columns, write_columns
+
+BASE_DIR = Path().resolve()
+RAW_DIR = BASE_DIR / "data" / "raw"
+HIST_PATH = BASE_DIR / "data" / "processed" / "dataset_consulta.csv"
+WEATHER_DIR = BASE_DIR / "data" / "processed" / "temperaturas"
+DEFAULT_CHUNKSIZE = 100_000
+DEFAULT_MAX_GAP = 3
+
+# Región -> columna del modelo (Madrid -> Madrid_temperature_2m)
+REGIONS = {col.removesuffix("_temperature_2m"): col for col in TEMP_COLUMNS}
+_TIME_NAMES = ("time", "date", "datetime", "fecha", "timestamp")
+
+
+# -----------------------------------------
+# LOCALIZAR FICHEROS POR REGIÓN
+# -----------------------------------------
+def _normalize(name):
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    return name.lower().replace("-", "_").replace(" ", "_")
+
+
+def region_of(name):
+    """Región a la que pertenece un fichero según su nombre (``madrid_2016.csv``)."""
+    stem = _normalize(Path(name).stem)
+    for region in REGIONS:
+        if _normalize(region) in stem:
+            return region
+    return None
+
+
+def discover(raw_dir=RAW_DIR):
+    """``{región: [(zip, miembro), ...]}`` con los CSV de los zips de ``raw_dir``.
+
+    Solo se leen los índices de los zips; los CSV sueltos llevan ``None``
+    como miembro.
+    """
+    sources = {}
+    for path in sorted(Path(raw_dir).glob("*")):
+        if path.suffix == ".zip":
+            with zipfile.ZipFile(path) as zf:
+                members = [m for m in zf.namelist() if m.lower().endswith(".csv")]
+            entries = [(str(path), m, region_of(m) or region_of(path.name)) for m in members]
+        elif path.suffix == ".csv":
+            entries = [(str(path), None, region_of(path.name))]
+        else:
+            continue
+        for archive, member, region in entries:
+            if region is not None:
+                sources.setdefault(region, []).append((archive, member))
+    return sources
+
+
+# -----------------------------------------
+# LECTURA EN STREAMING
+# -----------------------------------------
+@contextmanager
+def _open_text(archive, member):
+    if member is None:
+        with open(archive, encoding="utf-8", newline="") as fh:
+            yield fh
+        return
+    # ZipFile.open descomprime bajo demanda: el CSV nunca se extrae a disco
+    with zipfile.ZipFile(archive) as zf, zf.open(member) as raw:
+        yield io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+
+def _read_header(stream):
+    """Salta el preámbulo de metadatos (p. ej. exportaciones de Open-Meteo).
+
+    Devuelve las columnas de la cabecera y la zona horaria declarada en el
+    preámbulo, si la hay.
+    """
+    timezone = None
+    previous = None
+    for line in stream:
+        cells = [c.strip() for c in line.rstrip("\r\n").split(",")]
+        if cells and cells[0].lower() in _TIME_NAMES:
+            return cells, timezone
+        if previous is not None and "timezone" in previous and len(cells) == len(previous):
+            value = cells[previous.index("timezone")]
+            timezone = None if value in ("", "GMT", "UTC") else value
+        previous = [c.lower() for c in cells]
+    raise ValueError("No se encontró la cabecera con la columna de tiempo")
+
+
+def _temperature_column(columns):
+    for col in columns:
+        if _normalize(col).startswith("temperature_2m"):
+            return col
+    for col in columns:
+        if "temp" in _normalize(col):
+            return col
+    raise ValueError(f"No hay columna de temperatura entre: {columns}")
+
+
+def _epoch_hours(times, timezone):
+    fecha = pd.to_datetime(times, format="ISO8601", errors="coerce")
+    if fecha.dt.tz is None:
+        fecha = fecha.dt.tz_localize(timezone or "UTC", ambiguous="NaT", nonexistent="NaT")
+    fecha = fecha.dt.tz_convert("UTC").dt.floor("h")
+    return ((fecha - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)).to_numpy(dtype="float64")
+
+
+# -----------------------------------------
+# TRABAJO DE CADA PROCESO
+# -----------------------------------------
+def ingest_region(sources, index, chunksize=DEFAULT_CHUNKSIZE, default_tz="UTC"):
+    """Media horaria de temperatura de una región alineada a ``index``.
+
+    Los CSV se leen por bloques y cada bloque se acumula en dos vectores del
+    tamaño del índice (suma y número de lecturas por hora), así que la
+    memoria no depende del tamaño ni de la resolución de los ficheros.
+    Devuelve la media (NaN en horas sin datos) y las filas leídas.
+    """
+    sums = np.zeros(len(index), dtype=np.float64)
+    counts = np.zeros(len(index), dtype=np.int64)
+    rows = 0
+    for archive, member in sources:
+        with _open_text(archive, member) as stream:
+            header, timezone = _read_header(stream)
+            time_col, temp_col = header[0], _temperature_column(header)
+            reader = pd.read_csv(stream, names=header, usecols=[time_col, temp_col], chunksize=chunksize,
+                                 dtype={temp_col: "float32"})
+            for chunk in reader:
+                rows += len(chunk)
+                hours = _epoch_hours(chunk[time_col], timezone or default_tz)
+                values = chunk[temp_col].to_numpy(dtype=np.float64)
+                pos = np.searchsorted(index, hours)
+                ok = (pos < len(index)) & ~np.isnan(values) & ~np.isnan(hours)
+                ok[ok] = index[pos[ok]] == hours[ok]
+                sums += np.bincount(pos[ok], weights=values[ok], minlength=len(index))
+                counts += np.bincount(pos[ok], minlength=len(index))
+    with np.errstate(invalid="ignore"):
+        return (sums / counts).astype(np.float32), rows
+
+
+def _ingest_region_task(region, sources, index, chunksize, default_tz):
+    start = time.perf_counter()
+    values, rows = ingest_region(sources, index, chunksize, default_tz)
+    return region, values, rows, time.perf_counter() - start
+
+
+# -----------------------------------------
+# ETAPA COMPLETA
+# -----------------------------------------
+def fill_gaps(values, max_gap=DEFAULT_MAX_GAP):
+    """Interpolación lineal de huecos interiores de hasta ``max_gap`` horas."""
+    if max_gap <= 0:
+        return values
+    series = pd.Series(values, dtype="float64")
+    gaps = series.isna()
+    # Longitud de cada tramo de NaN: solo se rellenan los cortos
+    run_id = (gaps != gaps.shift()).cumsum()
+    run_len = gaps.groupby(run_id).transform("size")
+    filled = series.interpolate(limit_area="inside")
+    keep = gaps & (run_len > max_gap)
+    filled[keep] = np.nan
+    return filled.to_numpy(dtype=np.float32)
+
+
+def ingest(raw_dir=RAW_DIR, hist_path=HIST_PATH, out_dir=WEATHER_DIR, workers=None,
+           chunksize=DEFAULT_CHUNKSIZE, max_gap=DEFAULT_MAX_GAP, default_tz="UTC"):
+    """Convierte los ficheros de ``raw_dir`` en columnas de temperatura horarias.
+
+    Cada región se procesa en un proceso distinto. El resultado se alinea con
+    las horas del histórico de demanda y se guarda en ``out_dir`` con el
+    mismo formato columnar que la caché del histórico (``fecha`` int64 y
+    una columna float32 por región, con ``meta.json``).
+    """
+    sources = discover(raw_dir)
+    if not sources:
+        raise FileNotFoundError(f"No hay ficheros de temperatura reconocibles en: {raw_dir}")
+    index = np.asarray(HistoricalStore(hist_path).columns["fecha"], dtype=np.int64)
+
+    columns = {"fecha": index}
+    report = {}
+    workers = min(workers or os.cpu_count() or 1, len(sources))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_ingest_region_task, region, files, index, chunksize, default_tz)
+                   for region, files in sources.items()]
+        for future in futures:
+            region, values, rows, seconds = future.result()
+            filled = fill_gaps(values, max_gap)
+            columns[REGIONS[region]] = filled
+            report[region] = {
+                "files": [f"{Path(a).name}:{m}" if m else Path(a).name for a, m in sources[region]],
+                "rows_read": rows,
+                "coverage": float(np.mean(~np.isnan(values))) if len(values) else 0.0,
+                "coverage_filled": float(np.mean(~np.isnan(filled))) if len(filled) else 0.0,
+                "seconds": seconds,
+            }
+    write_columns(out_dir, columns, {"rows": len(index), "max_gap": max_gap, "regions": report})
+    return report
+
+
+def load_weather(weather_dir=WEATHER_DIR, start=None, end=None):
+    """Temperaturas ingeridas como DataFrame (``fecha`` UTC), o None si no hay.
+
+    Con ``start``/``end`` (incluidos) solo se lee ese tramo: las columnas se
+    abren con ``mmap_mode="r"`` y el tramo se localiza con ``searchsorted``
+    sobre ``fecha``, así que el coste no depende del tamaño del almacén.
+    """
+    columns = read_columns(weather_dir)
+    if not columns:
+        return None
+    fecha = columns["fecha"]
+    first = 0 if start is None else int(np.searchsorted(fecha, _epoch_seconds(start), side="left"))
+    last = len(fecha) if end is None else int(np.searchsorted(fecha, _epoch_seconds(end), side="right"))
+    df = pd.DataFrame({name: np.array(col[first:last]) for name, col in columns.items()})
+    df["fecha"] = pd.to_datetime(df["fecha"], unit="s", utc=True)
+    return df
+
+
+def _epoch_seconds(fecha):
+    return (pd.Timestamp(fecha) - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)
+
+
+def merge_weather(df, weather_dir=WEATHER_DIR):
+    """Añade (o completa) las columnas de temperatura de ``df`` con las ingeridas.
+
+    Solo se leen las temperaturas del rango de fechas de ``df``.
+    """
+    if df.empty:
+        return df
+    fechas = pd.to_datetime(df["fecha"], utc=True)
+    weather = load_weather(weather_dir, fechas.min(), fechas.max())
+    if weather is None:
+        return df
+    merged = df.merge(weather, on="fecha", how="left", suffixes=("", "_raw"))
+    for col in weather.columns.drop("fecha"):
+        if f"{col}_raw" in merged:
+            merged[col] = merged[col].fillna(merged.pop(f"{col}_raw"))
+    return merged
+
+
+# -----------------------------------------
+# CLI
+# -----------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingesta de temperaturas horarias por región desde data/raw")
+    parser.add_argument("--raw", default=str(RAW_DIR), help="Directorio con los zip (o CSV) de origen")
+    parser.add_argument("--data", default=str(HIST_PATH), help="Histórico de demanda cuyas horas se usan como índice")
+    parser.add_argument("--out", default=str(WEATHER_DIR))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--max-gap", type=int, default=DEFAULT_MAX_GAP, help="Horas máximas a interpolar")
+    parser.add_argument("--tz", default="UTC", help="Zona horaria de las fechas sin zona ni preámbulo")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    report = ingest(args.raw, args.data, args.out, args.workers, args.chunksize, args.max_gap, args.tz)
+    for region, r in report.items():
+        print(f"{region:<12} {r['rows_read']:>10,} filas en {len(r['files'])} ficheros | "
+              f"cobertura {r['coverage']:.1%} -> {r['coverage_filled']:.1%} | {r['seconds']:.2f}s")
+    print(f"Total {time.perf_counter() - start:.2f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import argparse
+import json
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+BASE_DIR = Path().resolve()
+APP_PATH = BASE_DIR / "app.py"
+MODEL_PATH = BASE_DIR / "models" / "xgb_model.pkl"
+
+# "app" recorre la app con AppTest; el resto llama a la ruta de inferencia directamente
+SCENARIOS = ("app", "predict", "explain", "forecast")
+
+# AppTest sustituye el Runtime global de Streamlit en cada ``run()``: dos
+# ejecuciones simultáneas en el mismo proceso se pisan (ficheros de medios,
+# estado de widgets). Las de un proceso se serializan y la espera cuenta en
+# la latencia, como la cola de reruns que ve el usuario; para ejecución
+# realmente paralela, ``--processes``.
+_APPTEST_LOCK = threading.Lock()
+
+
+# -----------------------------------------
+# ESCENARIOS (UNA OPERACIÓN POR LLAMADA)
+# -----------------------------------------
+def _app_session(app_path):
+    """Una sesión simulada: EDA, paso a Predicción y Calcular. Devuelve segundos por paso."""
+    from streamlit.testing.v1 import AppTest
+
+    def timed(name, action):
+        start = time.perf_counter()
+        with _APPTEST_LOCK:
+            at = action()
+        steps[name] = time.perf_counter() - start
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception[0].value}")
+        return at
+
+    steps = {}
+    at = timed("app_eda", lambda: AppTest.from_file(str(app_path), default_timeout=120).run())
+    at = timed("app_prediccion", lambda: at.sidebar.radio[0].set_value("Predicción").run())
+    calcular = next((b for b in at.button if b.label == "Calcular"), None)
+    if calcular is None:
+        raise RuntimeError("app_prediccion: no aparece el botón Calcular")
+    timed("app_calcular", lambda: calcular.click().run())
+    return steps
+
+
+def _inference_op(scenario, model_path, seed):
+    """Función sin argumentos que ejecuta una operación del escenario y devuelve sus pasos."""
+    from fast_predict import FastPredictor, sample_inputs
+    from model_store import ModelStore
+    from registry import resolve_model
+
+    model = ModelStore(resolve_model(model_path)).get()
+    predictor = FastPredictor(model)
+    inputs = sample_inputs(256, seed)
+    counter = iter(range(sys.maxsize))
+    lock = threading.Lock()
+
+    def next_input():
+        with lock:
+            return inputs[next(counter) % len(inputs)]
+
+    if scenario == "predict":
+        def op():
+            start = time.perf_counter()
+            predictor.predict_one(next_input())
+            return {"predict": time.perf_counter() - start}
+    elif scenario == "explain":
+        # Una fila con TreeSHAP exacto, como el desglose de la app
+        def op():
+            start = time.perf_counter()
+            predictor.explain(predictor.row(next_input()).copy())
+            return {"explain": time.perf_counter() - start}
+    else:
+        from forecast import LAG_WINDOW, RecursiveForecaster
+        import pandas as pd
+
+        forecaster = RecursiveForecaster(model)
+        demandas = np.full(LAG_WINDOW, 28000.0)
+        inicio = pd.Timestamp("2024-01-01", tz="UTC")
+
+        def op():
+            start = time.perf_counter()
+            forecaster.forecast(demandas, inicio, 24, {})
+            return {"forecast": time.perf_counter() - start}
+    return op
+
+
+# -----------------------------------------
+# TRABAJADOR (UN PROCESO)
+# -----------------------------------------
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB y macOS en bytes
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_worker(scenario, concurrency, iterations, app_path=APP_PATH, model_path=MODEL_PATH, seed=0, warmup=True):
+    """Lanza ``concurrency`` usuarios en hilos de este proceso, ``iterations`` operaciones cada uno.
+
+    Los hilos comparten los recursos de ``st.cache_resource`` igual que las
+    sesiones de un mismo ``app.py``. Con ``warmup`` se hace antes una
+    operación sin medir, para no mezclar el arranque en frío con el régimen.
+    """
+    if scenario == "app":
+        op = lambda: _app_session(app_path)  # noqa: E731
+    else:
+        op = _inference_op(scenario, model_path, seed)
+    if warmup:
+        op()
+
+    latencies, errors = {}, []
+    lock = threading.Lock()
+
+    def user():
+        for _ in range(iterations):
+            try:
+                steps = op()
+            except Exception as exc:
+                with lock:
+                    errors.append(f"{type(exc).__name__}: {exc}")
+                continue
+            with lock:
+                for name, seconds in steps.items():
+                    latencies.setdefault(name, []).append(seconds)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(user) for _ in range(concurrency)]:
+            future.result()
+    return {
+        "latencies": latencies,
+        "errors": errors,
+        "wall_s": time.perf_counter() - start,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+# -----------------------------------------
+# ORQUESTACIÓN Y RESUMEN
+# -----------------------------------------
+def run(scenario, concurrency=4, iterations=5, processes=1, app_path=APP_PATH, model_path=MODEL_PATH, warmup=True):
+    """Ejecuta el escenario en ``processes`` procesos nuevos a la vez y agrega los resultados.
+
+    Cada proceso se lanza con ``subprocess`` (como ``bench_startup``) para
+    que su pico de memoria sea el de un proceso limpio, igual que un
+    ``app.py`` recién arrancado.
+    """
+    args = [sys.executable, str(Path(__file__).resolve()), "--worker", scenario,
+            "--concurrency", str(concurrency), "--iterations", str(iterations),
+            "--app", str(app_path), "--model", str(model_path)]
+    if not warmup:
+        args.append("--no-warmup")
+    procs = [subprocess.Popen(args + ["--seed", str(i)], cwd=BASE_DIR, stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE, text=True) for i in range(processes)]
+    workers = []
+    for proc in procs:
+        out, err = proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError(f"El proceso de carga terminó con código {proc.returncode}:\n{err[-2000:]}")
+        workers.append(json.loads(out.strip().splitlines()[-1]))
+    return summarize(scenario, concurrency, iterations, workers)
+
+
+def summarize(scenario, concurrency, iterations, workers):
+    """Rendimiento (op/s) y p50/p99 por paso, con el pico de RSS de cada proceso."""
+    wall = max(w["wall_s"] for w in workers)
+    steps = {}
+    for name in dict.fromkeys(name for w in workers for name in w["latencies"]):
+        arr = np.concatenate([w["latencies"].get(name, []) for w in workers]) * 1000
+        steps[name] = {
+            "ops": int(len(arr)),
+            "throughput": len(arr) / wall if wall else None,
+            "p50_ms": float(np.percentile(arr, 50)),
+            "p99_ms": float(np.percentile(arr, 99)),
+            "max_ms": float(arr.max()),
+        }
+    return {
+        "scenario": scenario,
+        "processes": len(workers),
+        "concurrency": concurrency,
+        "iterations": iterations,
+        "wall_s": wall,
+        "steps": steps,
+        "errors": [e for w in workers for e in w["errors"]],
+        "peak_rss_mb": [w["peak_rss_mb"] for w in workers],
+    }
+
+
+def compare(report, baseline, tolerance=0.2):
+    """Pasos cuyo p99 empeora más de ``tolerance`` (fracción) frente a ``baseline``."""
+    regressions = []
+    for name, step in report["steps"].items():
+        before = baseline.get("steps", {}).get(name)
+        if before and step["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            regressions.append((name, before["p99_ms"], step["p99_ms"]))
+    return regressions
+
+
+# -----------------------------------------
+# CLI
+# -----------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga: sesiones concurrentes de la app y rutas de inferencia")
+    parser.add_argument("scenarios", nargs="*", metavar="escenario",
+                        help=f"Escenarios a ejecutar ({', '.join(SCENARIOS)}); por defecto todos")
+    parser.add_argument("--concurrency", type=int, default=4, help="Usuarios simultáneos (hilos) por proceso")
+    parser.add_argument("--iterations", type=int, default=5, help="Operaciones por usuario")
+    parser.add_argument("--processes", type=int, default=1, help="Procesos en paralelo (cada uno como un app.py)")
+    parser.add_argument("--app", default=str(APP_PATH))
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Ruta del modelo, versión del registro (v0003) o 'latest'")
+    parser.add_argument("--no-warmup", action="store_true", help="Medir también la primera operación (arranque en frío)")
+    parser.add_argument("--json", default=None, help="Guardar el informe en este fichero")
+    parser.add_argument("--baseline", default=None, help="Informe JSON anterior con el que comparar el p99")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Empeoramiento de p99 admitido frente a --baseline")
+    parser.add_argument("--worker", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--seed", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        result = run_worker(args.worker, args.concurrency, args.iterations, args.app, args.model,
+                            args.seed, not args.no_warmup)
+        print(json.dumps(result))
+        return 0
+
+    unknown = sorted(set(args.scenarios) - set(SCENARIOS))
+    if unknown:
+        parser.error(f"escenarios desconocidos: {', '.join(unknown)}")
+    reports = []
+    for scenario in args.scenarios or SCENARIOS:
+        r = run(scenario, args.concurrency, args.iterations, args.processes, args.app, args.model, not args.no_warmup)
+        reports.append(r)
+        rss = ", ".join("-" if mb is None else f"{mb:,.0f}" for mb in r["peak_rss_mb"])
+        print(f"{scenario}: {r['processes']} proceso(s) x {r['concurrency']} usuarios x {r['iterations']} "
+              f"operaciones en {r['wall_s']:.2f}s | pico RSS por proceso: {rss} MB")
+        for name, s in r["steps"].items():
+            print(f"  {name:<16} {s['ops']:>6,} op | {s['throughput']:9.1f} op/s | p50 {s['p50_ms']:9.2f} ms "
+                  f"| p99 {s['p99_ms']:9.2f} ms | máx {s['max_ms']:9.2f} ms")
+        for error in r["errors"][:5]:
+            print(f"  error: {error}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(reports, indent=2))
+    if args.baseline:
+        baseline = {r["scenario"]: r for r in json.loads(Path(args.baseline).read_text())}
+        regressions = [(r["scenario"], *reg) for r in reports if r["scenario"] in baseline
+                       for reg in compare(r, baseline[r["scenario"]], args.tolerance)]
+        for scenario, name, before, after in regressions:
+            print(f"REGRESIÓN {scenario}/{name}: p99 {before:.2f} ms -> {after:.2f} ms")
+        if regressions:
+            return 1
+    return 1 if any(r["errors"] for r in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from pathlib import Path
+import argparse
+import json
+import os
+import statistics
+import time
+import warnings
+
+BASE_DIR = Path().resolve()
+MODEL_PATH = BASE_DIR / "models" / "xgb_model.pkl"
+NATIVE_SUFFIXES = (".ubj", ".json")
+FEATURES_SUFFIX = ".features.json"
+
+
+# -----------------------------------------
+# RUTAS
+# -----------------------------------------
+def features_path(path):
+    """``models/xgb_model.ubj`` -> ``models/xgb_model.features.json``."""
+    path = Path(path)
+    return path.with_name(path.stem + FEATURES_SUFFIX)
+
+
+def preferred_model_path(path):
+    """Si junto al pickle existe el modelo en formato nativo, se usa ese.
+
+    Solo si no es más antiguo que el pickle: al desplegar un
+    ``xgb_model.pkl`` nuevo sin volver a convertirlo, el ``.ubj`` anterior
+    quedaría por delante y el pickle se ignoraría. En ese caso se usa el
+    pickle y se avisa de que hay que ejecutar ``model_format.py`` otra vez.
+    """
+    path = Path(path)
+    if path.suffix != ".pkl":
+        return path
+    for suffix in NATIVE_SUFFIXES:
+        native = path.with_suffix(suffix)
+        try:
+            native_mtime = native.stat().st_mtime_ns
+        except FileNotFoundError:
+            continue
+        try:
+            stale = path.stat().st_mtime_ns > native_mtime
+        except FileNotFoundError:
+            stale = False
+        if stale:
+            warnings.warn(f"{native.name} es anterior a {path.name}: se usa el pickle. "
+                          f"Vuelve a convertirlo con model_format.py", stacklevel=2)
+            return path
+        return native
+    return path
+
+
+# -----------------------------------------
+# GUARDADO Y CARGA
+# -----------------------------------------
+def save_native(model, path):
+    """Guarda el booster en formato nativo (UBJSON o JSON según la extensión).
+
+    Las variables y sus tipos van además en ``<modelo>.features.json`` para
+    poder validarlas (y consultarlas) sin cargar XGBoost. Ambos ficheros se
+    escriben a un temporal y se renombran; el modelo el último, que es el que
+    vigila ``ModelStore``.
+    """
+    path = Path(path)
+    if path.suffix not in NATIVE_SUFFIXES:
+        raise ValueError(f"Extensión no soportada para el formato nativo: {path.suffix}")
+    booster = model.get_booster()
+    sidecar = {
+        "features": [str(col) for col in model.feature_names_in_],
+        "feature_types": booster.feature_types,
+        "best_iteration": getattr(model, "best_iteration", None),
+        "n_trees": booster.num_boosted_rounds(),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_features = features_path(path).with_name(f".{features_path(path).name}.tmp")
+    tmp_features.write_text(json.dumps(sidecar, indent=2))
+    os.replace(tmp_features, features_path(path))
+    # save_model elige el formato por la extensión: el temporal conserva la del destino
+    tmp = path.with_name(f".tmp-{path.name}")
+    model.save_model(tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def load_native(path):
+    """Carga un modelo nativo en un ``XGBRegressor`` sin deserializar pickles."""
+    from xgboost import XGBRegressor
+
+    path = Path(path)
+    model = XGBRegressor()
+    model.load_model(path)
+    sidecar_path = features_path(path)
+    if sidecar_path.exists():
+        expected = json.loads(sidecar_path.read_text())["features"]
+        found = [str(col) for col in getattr(model, "feature_names_in_", [])]
+        if not found:
+            # Booster guardado sin nombres: los toma del fichero de variables
+            model.get_booster().feature_names = expected
+        elif found != expected:
+            raise ValueError(f"Las variables de {path.name} no coinciden con {sidecar_path.name}: {found} != {expected}")
+    return model
+
+
+def load_model(path):
+    """Carga el modelo según su extensión (nativo o pickle de joblib)."""
+    path = Path(path)
+    if path.suffix in NATIVE_SUFFIXES:
+        return load_native(path)
+    import joblib
+    return joblib.load(path)
+
+
+# -----------------------------------------
+# CONVERSIÓN Y BENCHMARK
+# -----------------------------------------
+def convert(source, target=None, n_check=2000):
+    """Convierte el pickle a formato nativo y comprueba que predice lo mismo.
+
+    El modelo y su fichero de variables se escriben con un nombre temporal,
+    que ``ModelStore`` no ve, y solo se renombran al destino si las
+    predicciones coinciden; si no, se borran ambos.
+    """
+    import numpy as np
+    import pandas as pd
+    from features import align_features
+    from fast_predict import sample_inputs
+
+    source = Path(source)
+    target = Path(target) if target else source.with_suffix(".ubj")
+    original = load_model(source)
+    staged = target.with_name(f".convert-{target.name}")
+    try:
+        save_native(original, staged)
+        converted = load_native(staged)
+        X = align_features(pd.DataFrame(sample_inputs(n_check)), original.feature_names_in_)
+        diff = float(np.max(np.abs(original.predict(X) - converted.predict(X))))
+        if diff != 0.0:
+            raise ValueError(f"El modelo convertido no reproduce las predicciones (diferencia máxima {diff:.3g} MW)")
+        # Variables primero y el modelo el último, como en ``save_native``
+        os.replace(features_path(staged), features_path(target))
+        os.replace(staged, target)
+    finally:
+        for leftover in (staged, features_path(staged)):
+            leftover.unlink(missing_ok=True)
+    return {"target": str(target), "rows_checked": len(X), "max_abs_diff": diff}
+
+
+def benchmark_load(paths, runs=5):
+    """Mediana del tiempo de carga de cada fichero (tras una carga de calentamiento)."""
+    results = {}
+    for path in paths:
+        load_model(path)
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            load_model(path)
+            samples.append(time.perf_counter() - start)
+        results[str(path)] = {"median_s": statistics.median(samples), "size_bytes": Path(path).stat().st_size}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convierte el modelo pickle al formato nativo de XGBoost")
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Pickle de origen")
+    parser.add_argument("--out", default=None, help="Destino .ubj o .json (por defecto junto al pickle, .ubj)")
+    parser.add_argument("--check-rows", type=int, default=2000, help="Filas para comparar predicciones")
+    parser.add_argument("--runs", type=int, default=5, help="Repeticiones del benchmark de carga")
+    args = parser.parse_args(argv)
+
+    result = convert(args.model, args.out, args.check_rows)
+    print(f"Convertido a {result['target']}: {result['rows_checked']:,} predicciones idénticas")
+    for path, r in benchmark_load([args.model, result["target"]], args.runs).items():
+        print(f"  {Path(path).name:<24} carga {r['median_s'] * 1000:8.1f} ms | {r['size_bytes'] / 1e6:6.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
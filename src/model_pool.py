@@ -0,0 +1,213 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from collections import OrderedDict
+from pathlib import Path
+import argparse
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from fast_predict import FastPredictor, sample_inputs
+from features import align_features
+from model_store import ModelStore
+from registry import ModelRegistry, is_registry_name, resolve_model
+
+BASE_DIR = Path().resolve()
+MODEL_PATH = BASE_DIR / "models" / "xgb_model.pkl"
+DEFAULT_BUDGET_MB = 512
+PRODUCTION = "produccion"  # alias del modelo por defecto en la API
+
+
+# -----------------------------------------
+# POOL DE MODELOS CON PRESUPUESTO DE MEMORIA
+# -----------------------------------------
+class _Entry:
+    __slots__ = ("store", "predictor", "version", "size_bytes")
+
+    def __init__(self, store):
+        self.store = store
+        self.predictor = None
+        self.version = None
+        self.size_bytes = 0
+
+
+class ModelPool:
+    """Varios modelos cargados bajo demanda y limitados por memoria (LRU).
+
+    Cada modelo se identifica por su ruta (una versión del registro,
+    ``latest`` o ``produccion`` se resuelven antes, así que dos nombres del
+    mismo fichero comparten entrada) y se carga con su propio ``ModelStore``
+    la primera vez que se pide. El tamaño de cada modelo se estima con su
+    serialización nativa (``Booster.save_raw``), del orden de lo que ocupa
+    en memoria; si la suma supera ``budget_mb`` se descartan los menos
+    usados recientemente, nunca el que se acaba de pedir ni el de
+    producción (``default``), que otros componentes mantienen vivo.
+
+    Con ``allow_paths=False`` solo se admiten ``produccion``, ``latest`` y
+    versiones del registro: cargar un pickle ejecuta código, así que una
+    ruta que llegue de fuera (la API HTTP) no debe poder elegir el fichero.
+    """
+
+    def __init__(self, default=MODEL_PATH, budget_mb=DEFAULT_BUDGET_MB, registry=None, check_interval=1.0,
+                 allow_paths=True):
+        self.default = Path(default)
+        self.allow_paths = allow_paths
+        self.budget_bytes = int(budget_mb * 1024 ** 2)
+        self.registry = registry or ModelRegistry()
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    # -----------------------------
+    # API pública
+    # -----------------------------
+    def resolve(self, spec=None):
+        """Ruta del modelo: ``None``/``produccion`` es el de producción; si no, ``resolve_model``."""
+        if spec is None or str(spec) == PRODUCTION:
+            return self.default
+        if not self.allow_paths and not is_registry_name(spec):
+            raise ValueError(f"Modelo no válido: {spec!r} (se admite '{PRODUCTION}', 'latest' o una versión como v0003)")
+        return Path(resolve_model(spec, self.registry))
+
+    def store(self, spec=None):
+        """``ModelStore`` del modelo (sin cargarlo todavía si es nuevo)."""
+        return self._store(self.resolve(spec))
+
+    def _store(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(ModelStore(key, self.check_interval))
+            self._entries.move_to_end(key)
+            return entry.store
+
+    def get(self, spec=None):
+        """Modelo vigente (el estimador de sklearn), contabilizado en el presupuesto."""
+        self.predictor(spec)
+        return self.store(spec).get()
+
+    def predictor(self, spec=None):
+        """``FastPredictor`` del modelo vigente; lo carga (y libera otros) si hace falta."""
+        key = self.resolve(spec)
+        store = self._store(key)
+        # La carga se hace fuera del candado del pool: pedir otro modelo ya
+        # cargado no espera a que termine
+        try:
+            model = store.get()
+        except Exception:
+            # Si nunca llegó a cargar, la entrada no ocupa presupuesto y no se
+            # expulsaría nunca: se quita para no acumular nombres erróneos
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.store is store and entry.predictor is None:
+                    del self._entries[key]
+            raise
+        version = store.version
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.store is not store:
+                # Se descartó mientras cargaba: vuelve como el más reciente
+                entry = self._entries[key] = _Entry(store)
+            if entry.version == version:
+                self.hits += 1
+                return entry.predictor
+            entry.predictor = FastPredictor(model)
+            entry.size_bytes = _model_size(model)
+            entry.version = version
+            self.loads += 1
+            self._entries.move_to_end(key)
+            self._evict(keep=key)
+            return entry.predictor
+
+    def compare(self, specs, rows):
+        """Predicciones de varios modelos para las mismas filas, una columna por nombre pedido.
+
+        ``rows`` es un DataFrame (o un dict para una sola fila) con las
+        variables de entrada. La matriz float32 se construye una vez por
+        orden de variables y cada modelo predice todas las filas en una sola
+        llamada.
+        """
+        if isinstance(rows, dict):
+            rows = pd.DataFrame([rows])
+        matrices = {}
+        result = {}
+        for spec in specs:
+            predictor = self.predictor(spec)
+            order = tuple(predictor.features)
+            if order not in matrices:
+                matrices[order] = np.ascontiguousarray(align_features(rows, order).to_numpy(dtype=np.float32))
+            result[PRODUCTION if spec is None else str(spec)] = predictor.predict(matrices[order])
+        return pd.DataFrame(result, index=rows.index)
+
+    def stats(self):
+        with self._lock:
+            loaded = [
+                {"path": str(key), "version": e.version, "size_mb": e.size_bytes / 1024 ** 2}
+                for key, e in self._entries.items() if e.predictor is not None
+            ]
+            return {
+                "budget_mb": self.budget_bytes / 1024 ** 2,
+                "used_mb": sum(e.size_bytes for e in self._entries.values()) / 1024 ** 2,
+                "loaded": loaded,  # del menos al más reciente
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+    # -----------------------------
+    # Expulsión
+    # -----------------------------
+    def _evict(self, keep):
+        used = sum(e.size_bytes for e in self._entries.values())
+        for key in list(self._entries):
+            if used <= self.budget_bytes:
+                break
+            if key in (keep, self.default):
+                continue
+            entry = self._entries.pop(key)
+            used -= entry.size_bytes
+            if entry.predictor is not None:
+                self.evictions += 1
+
+
+def _model_size(model):
+    try:
+        return len(model.get_booster().save_raw(raw_format="ubj"))
+    except TypeError:  # xgboost < 1.7 sin ``raw_format``
+        return len(model.get_booster().save_raw())
+
+
+# -----------------------------------------
+# CLI
+# -----------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara varios modelos sobre las mismas entradas")
+    parser.add_argument("models", nargs="+", help="Modelos: rutas, versiones del registro (v0003), 'latest' o 'produccion'")
+    parser.add_argument("--budget-mb", type=float, default=DEFAULT_BUDGET_MB, help="Memoria máxima para modelos cargados")
+    parser.add_argument("-n", type=int, default=1000, help="Filas de entrada aleatorias")
+    args = parser.parse_args(argv)
+
+    pool = ModelPool(budget_mb=args.budget_mb)
+    rows = pd.DataFrame(sample_inputs(args.n))
+    start = time.perf_counter()
+    result = pool.compare(args.models, rows)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    pool.compare(args.models, rows)
+    warm = time.perf_counter() - start
+
+    stats = pool.stats()
+    print(f"{len(args.models)} modelos x {args.n:,} filas: {first:.2f}s con carga, {warm * 1000:.1f} ms en caliente")
+    print(f"Memoria de modelos: {stats['used_mb']:.1f} / {stats['budget_mb']:g} MB | "
+          f"cargas {stats['loads']} | expulsiones {stats['evictions']}")
+    print(result.describe().T[["mean", "std", "min", "max"]].round(1).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from pathlib import Path
+import hashlib
+import threading
+import time
+
+from model_format import load_model, preferred_model_path
+
+
+# -----------------------------------------
+# MODELO COMPARTIDO POR PROCESO
+# -----------------------------------------
+class ModelStore:
+    """Carga el modelo una sola vez por proceso y lo recarga si cambia el fichero.
+
+    Streamlit re-ejecuta el script entero en cada interacción; el objeto se
+    comparte entre sesiones (``st.cache_resource``) para no deserializar el
+    modelo en cada rerun. En cada ``get()`` solo se hace un ``stat`` del
+    fichero: si cambia el mtime se calcula el hash y, si el contenido es
+    distinto, se carga el nuevo modelo y se sustituye de forma atómica.
+
+    Si se pide el pickle y a su lado existe el formato nativo de XGBoost
+    (``.ubj``/``.json``), se carga ese: es más rápido y no ejecuta código.
+    """
+
+    def __init__(self, path, check_interval=1.0):
+        self.requested_path = Path(path)
+        self.path = preferred_model_path(self.requested_path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._model = None
+        self._mtime = None
+        self._sha256 = None
+        self._last_check = 0.0
+        self.load_count = 0
+        self.reload_count = 0
+        self.last_load_seconds = None
+        self.total_load_seconds = 0.0
+        self.loaded_at = None
+
+    # -----------------------------
+    # API pública
+    # -----------------------------
+    def get(self):
+        """Devuelve el modelo vigente, recargándolo si el fichero ha cambiado."""
+        now = time.monotonic()
+        if self._model is not None and now - self._last_check < self.check_interval:
+            return self._model
+
+        with self._lock:
+            self._last_check = now
+            path = preferred_model_path(self.requested_path)
+            if path != self.path:
+                # Ha aparecido (o desaparecido) el modelo nativo junto al pickle
+                self.path, self._mtime = path, None
+            try:
+                mtime = self.path.stat().st_mtime_ns
+            except FileNotFoundError:
+                if self._model is not None:
+                    # Mantenemos el modelo en memoria durante un despliegue a medias
+                    return self._model
+                raise FileNotFoundError(f"No se encontró el modelo en: {self.path}")
+
+            if self._model is None or mtime != self._mtime:
+                sha256 = _file_sha256(self.path)
+                if self._model is None or sha256 != self._sha256:
+                    try:
+                        self._load(sha256)
+                    except Exception:
+                        # Fichero a medio copiar: seguimos con el anterior y
+                        # reintentamos en la siguiente comprobación
+                        if self._model is None:
+                            raise
+                        return self._model
+                self._mtime = mtime
+            return self._model
+
+    @property
+    def version(self):
+        """Hash (sha256 abreviado) del fichero del modelo cargado."""
+        self.get()
+        return self._sha256[:12]
+
+    def metrics(self):
+        return {
+            "path": str(self.path),
+            "version": self._sha256[:12] if self._sha256 else None,
+            "load_count": self.load_count,
+            "reload_count": self.reload_count,
+            "last_load_seconds": self.last_load_seconds,
+            "total_load_seconds": self.total_load_seconds,
+            "loaded_at": self.loaded_at,
+        }
+
+    # -----------------------------
+    # Carga
+    # -----------------------------
+    def _load(self, sha256):
+        # joblib/xgboost solo se importan al cargar el primer modelo
+        start = time.perf_counter()
+        model = load_model(self.path)
+        elapsed = time.perf_counter() - start
+
+        # Sustitución atómica: las sesiones en curso siguen con el modelo
+        # anterior hasta su siguiente get()
+        if self._model is not None:
+            self.reload_count += 1
+        self._model = model
+        self._sha256 = sha256
+        self.load_count += 1
+        self.last_load_seconds = elapsed
+        self.total_load_seconds += elapsed
+        self.loaded_at = time.time()
+
+
+def _file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
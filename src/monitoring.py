@@ -0,0 +1,469 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from collections import deque
+from pathlib import Path
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from fast_predict import FastPredictor
+from features import (HISTORY_HOURS, LAG_COLUMNS, ROLLING_COLUMN, TEMP_COLUMNS, align_features, build_features,
+                      compute_new_rows)
+from history import HistoricalStore
+from ingest_weather import merge_weather
+from model_store import ModelStore
+from registry import resolve_model
+
+BASE_DIR = Path().resolve()
+MODEL_PATH = BASE_DIR / "models" / "xgb_model.pkl"
+HIST_PATH = BASE_DIR / "data" / "processed" / "dataset_consulta.csv"
+STATE_PATH = BASE_DIR / "data" / "interim" / "monitor_state.json"
+
+# Entradas cuya deriva se vigila (el calendario cambia por definición)
+DRIFT_COLUMNS = [*LAG_COLUMNS, ROLLING_COLUMN, *TEMP_COLUMNS]
+
+
+# -----------------------------------------
+# ESTADÍSTICOS EN STREAMING (O(1) POR ACTUALIZACIÓN)
+# -----------------------------------------
+class Welford:
+    """Media y varianza acumuladas sin guardar las observaciones."""
+
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count, self.mean, self.m2 = count, mean, m2
+
+    def update(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean, "m2": self.m2}
+
+
+class RollingMean:
+    """Media de las últimas ``window`` observaciones con suma mantenida."""
+
+    def __init__(self, window, values=()):
+        self.window = window
+        self.values = deque(values, maxlen=window)
+        self.total = float(sum(self.values))
+
+    def update(self, x):
+        if len(self.values) == self.window:
+            self.total -= self.values[0]
+        self.values.append(x)
+        self.total += x
+
+    @property
+    def mean(self):
+        return self.total / len(self.values) if self.values else None
+
+    @property
+    def full(self):
+        return len(self.values) == self.window
+
+    def to_dict(self):
+        return {"window": self.window, "values": list(self.values)}
+
+
+class FeatureDrift:
+    """Deriva de una variable frente a su distribución de referencia.
+
+    Cada valor se pasa a anomalía estacional, ``(x - media del mes) /
+    desviación del mes`` con los estadísticos de referencia, para que el
+    invierno no parezca deriva frente a un año completo. La deriva se juzga
+    con la anomalía media de cada día: las horas de un mismo día están muy
+    correladas (la media móvil de 24 h o la temperatura apenas cambian de
+    una hora a la siguiente) y compararlas una a una con un año completo da
+    falsos positivos. Sobre las medias diarias se mantiene una media móvil
+    exponencial (desplazamiento en σ) y un histograma con olvido
+    exponencial (``decay`` por día, unas 5 semanas de ventana efectiva)
+    sobre los cuantiles de las medias diarias de referencia, con el que se
+    calcula el PSI. Cada actualización cuesta O(1) y O(tramos) al cerrar el
+    día.
+
+    Aun por días, una racha de calor dura semanas: la ventana equivale a
+    pocas observaciones independientes y el PSI fluctúa mucho sin que haya
+    deriva. ``psi_limit`` es el PSI que la ventana actual supera solo con
+    probabilidad 0,1 % si no hay deriva (PSI·n ~ χ² con tramos-1 grados
+    de libertad; exigente porque se comprueban muchas variables cada día),
+    con ``n`` el tamaño efectivo de Kish de los pesos exponenciales
+    corregido por la autocorrelación diaria de la referencia. Con mucha
+    autocorrelación ese límite pasa de 1, así que un cambio sostenido de la
+    media se juzga sobre todo con ``shift`` frente a ``shift_std``, su
+    desviación típica sin deriva.
+    """
+
+    def __init__(self, month_mean, month_std, edges, ref_freq, decay=0.97, ewma=0.0, counts=None,
+                 day=None, day_sum=0.0, day_count=0, rho=0.0, chi2_crit=18.47, weight_sq=0.0, daily_std=None):
+        self.month_mean = list(month_mean)
+        self.month_std = list(month_std)
+        self.edges = list(edges)
+        self.ref_freq = list(ref_freq)
+        self.decay = decay
+        self.ewma = ewma
+        self.counts = list(counts) if counts is not None else [0.0] * len(ref_freq)
+        self.day, self.day_sum, self.day_count = day, day_sum, day_count
+        self.rho = rho
+        self.chi2_crit = chi2_crit
+        self.weight_sq = weight_sq
+        self.daily_std = daily_std
+
+    @classmethod
+    def from_reference(cls, values, fechas, bins=5, decay=0.97):
+        from scipy.stats import chi2
+
+        values = np.asarray(values, dtype=np.float64)
+        fechas = pd.DatetimeIndex(pd.to_datetime(fechas, utc=True))
+        ok = ~np.isnan(values)
+        values, fechas = values[ok], fechas[ok]
+        months = fechas.month.to_numpy()
+        month_mean, month_std = [], []
+        for m in range(1, 13):
+            # Meses sin referencia (menos de un año de datos): estadísticos globales
+            sel = values[months == m] if np.any(months == m) else values
+            month_mean.append(float(sel.mean()))
+            month_std.append(float(sel.std()) or 1.0)
+        anomaly = (values - np.take(month_mean, months - 1)) / np.take(month_std, months - 1)
+        daily = pd.Series(anomaly).groupby(fechas.floor("D")).mean().to_numpy()
+        edges = np.unique(np.quantile(daily, np.linspace(0, 1, bins + 1)[1:-1]))
+        freq = np.bincount(np.searchsorted(edges, daily, side="right"), minlength=len(edges) + 1) / len(daily)
+        rho = float(np.corrcoef(daily[:-1], daily[1:])[0, 1]) if len(daily) > 2 else 0.0
+        rho = min(max(rho if np.isfinite(rho) else 0.0, 0.0), 0.95)
+        return cls(month_mean, month_std, edges.tolist(), freq.tolist(), decay, rho=rho,
+                   chi2_crit=float(chi2.ppf(0.999, len(freq) - 1)), daily_std=float(daily.std()))
+
+    def update(self, x, fecha):
+        """Acumula una hora; devuelve True si con ella se ha cerrado un día."""
+        if x is None or math.isnan(x):
+            return False
+        day = fecha.strftime("%Y-%m-%d")
+        closed = self.day is not None and day != self.day and self.day_count > 0
+        if closed:
+            self._close_day(self.day_sum / self.day_count)
+        if day != self.day:
+            self.day, self.day_sum, self.day_count = day, 0.0, 0
+        self.day_sum += (x - self.month_mean[fecha.month - 1]) / self.month_std[fecha.month - 1]
+        self.day_count += 1
+        return closed
+
+    def _close_day(self, anomaly):
+        self.ewma = self.decay * self.ewma + (1 - self.decay) * anomaly
+        slot = int(np.searchsorted(self.edges, anomaly, side="right"))
+        self.counts = [c * self.decay for c in self.counts]
+        self.counts[slot] += 1.0
+        self.weight_sq = self.weight_sq * self.decay ** 2 + 1.0
+
+    @property
+    def ready(self):
+        """Hay días suficientes (la mitad de la ventana efectiva) para juzgar la deriva."""
+        return sum(self.counts) >= 0.5 / (1 - self.decay)
+
+    @property
+    def effective_days(self):
+        """Días independientes equivalentes a la ventana (Kish y autocorrelación)."""
+        if self.weight_sq == 0:
+            return 0.0
+        return sum(self.counts) ** 2 / self.weight_sq * (1 - self.rho) / (1 + self.rho)
+
+    @property
+    def psi_limit(self):
+        n = self.effective_days
+        return self.chi2_crit / n if n > 0 else math.inf
+
+    @property
+    def shift_std(self):
+        """Desviación típica de ``shift`` sin deriva: EWMA de un AR(1) diario con ``rho``."""
+        if self.daily_std is None:
+            return None
+        lam, phi = 1 - self.decay, self.rho * self.decay
+        return self.daily_std * math.sqrt(lam / (2 - lam) * (1 + phi) / (1 - phi))
+
+    @property
+    def shift(self):
+        """Desplazamiento reciente de la anomalía diaria, en desviaciones típicas de la referencia."""
+        return self.ewma
+
+    @property
+    def psi(self):
+        total = sum(self.counts)
+        if total == 0:
+            return 0.0
+        # Suavizado de Laplace (medio día por tramo): con pocas semanas de
+        # días, un tramo vacío no dispara el logaritmo
+        k = len(self.counts)
+        eps = 1e-4
+        return float(sum(
+            ((c + 0.5) / (total + 0.5 * k) - max(r, eps)) * math.log((c + 0.5) / (total + 0.5 * k) / max(r, eps))
+            for c, r in zip(self.counts, self.ref_freq)
+        ))
+
+    def to_dict(self):
+        return {"month_mean": self.month_mean, "month_std": self.month_std, "edges": self.edges,
+                "ref_freq": self.ref_freq, "decay": self.decay, "ewma": self.ewma, "counts": self.counts,
+                "day": self.day, "day_sum": self.day_sum, "day_count": self.day_count,
+                "rho": self.rho, "chi2_crit": self.chi2_crit, "weight_sq": self.weight_sq,
+                "daily_std": self.daily_std}
+
+
+# -----------------------------------------
+# MONITOR
+# -----------------------------------------
+class Monitor:
+    """Residuos, MAE por hora del día y deriva de entradas en memoria constante.
+
+    ``update`` recibe cada par (predicción, real) con la fila de entrada del
+    modelo. Las alertas se emiten al entrar en estado de alerta (no en cada
+    hora mientras dura) y se guardan las últimas ``max_alerts``. ``panel``
+    conserva solo las últimas ``panel_hours`` horas para dibujarlas.
+    """
+
+    def __init__(self, drift=None, mae_window_days=30, panel_hours=24 * 14, max_alerts=100,
+                 residual_z=4.0, mae_factor=1.5, drift_shift=2.0, drift_z=2.58, drift_psi=0.25, drift_psi_max=1.0,
+                 warmup=48):
+        self.residuals = Welford()
+        self.abs_residuals = Welford()
+        self.mae_24h = RollingMean(24)
+        self.mae_by_hour = [RollingMean(mae_window_days) for _ in range(24)]
+        self.drift = drift or {}
+        self.panel = deque(maxlen=panel_hours)
+        self.alerts = deque(maxlen=max_alerts)
+        self.active = set()
+        self.alert_count = 0
+        self.last_fecha = None
+        self.thresholds = {"residual_z": residual_z, "mae_factor": mae_factor, "drift_shift": drift_shift,
+                           "drift_z": drift_z, "drift_psi": drift_psi, "drift_psi_max": drift_psi_max, "warmup": warmup}
+
+    @classmethod
+    def with_reference(cls, reference, columns=DRIFT_COLUMNS, **kwargs):
+        """Monitor nuevo con la distribución de referencia de ``columns`` en ``reference``."""
+        drift = {col: FeatureDrift.from_reference(reference[col], reference["fecha"]) for col in columns
+                 if col in reference and reference[col].notna().any()}
+        return cls(drift=drift, **kwargs)
+
+    # -----------------------------
+    # Actualización
+    # -----------------------------
+    def update(self, fecha, values, prediction, actual):
+        """Incorpora una hora: ``values`` son las variables de entrada del modelo (dict)."""
+        fecha = pd.Timestamp(fecha)
+        residual = float(actual) - float(prediction)
+        t = self.thresholds
+        # El umbral usa los estadísticos previos: el residuo nuevo aún no cuenta
+        if self.residuals.count >= t["warmup"] and self.residuals.std > 0:
+            z = (residual - self.residuals.mean) / self.residuals.std
+            self._flag("residuo", abs(z) > t["residual_z"], fecha, f"residuo {residual:+,.0f} MW (z={z:+.1f})")
+
+        self.residuals.update(residual)
+        self.abs_residuals.update(abs(residual))
+        self.mae_24h.update(abs(residual))
+        by_hour = self.mae_by_hour[fecha.hour]
+        by_hour.update(abs(residual))
+        if by_hour.full and self.abs_residuals.count >= t["warmup"] and self.abs_residuals.mean > 0:
+            ratio = by_hour.mean / self.abs_residuals.mean
+            self._flag(f"mae_hora_{fecha.hour:02d}", ratio > t["mae_factor"], fecha,
+                       f"MAE a las {fecha.hour}h {by_hour.mean:,.0f} MW (x{ratio:.1f} el global)")
+
+        for name, drift in self.drift.items():
+            if drift.update(values.get(name), fecha) and drift.ready:
+                shift, psi = abs(drift.shift), drift.psi
+                shift_limit, psi_limit = self._shift_limit(drift), self._psi_limit(drift)
+                # Histéresis: la alerta se apaga al bajar del 80 % del umbral
+                self._flag(f"deriva_{name}", shift > shift_limit or psi > psi_limit, fecha,
+                           f"{name}: desplazamiento {drift.shift:+.2f}σ (umbral {shift_limit:.2f}), "
+                           f"PSI {psi:.2f} (umbral {psi_limit:.2f})",
+                           clear=shift < 0.8 * shift_limit and psi < 0.8 * psi_limit)
+
+        self.panel.append([fecha.isoformat(), float(prediction), float(actual), residual, self.mae_24h.mean])
+        self.last_fecha = fecha
+
+    def _shift_limit(self, drift):
+        # ``drift_z`` desviaciones típicas de la EWMA sin deriva (1 % a dos
+        # colas), como mucho ``drift_shift`` σ
+        if drift.shift_std is None:
+            return self.thresholds["drift_shift"]
+        return min(self.thresholds["drift_z"] * drift.shift_std, self.thresholds["drift_shift"])
+
+    def _psi_limit(self, drift):
+        # El PSI mínimo es ``drift_psi``, más si la ventana equivale a pocos
+        # días independientes, pero nunca por encima de ``drift_psi_max``:
+        # sin tope, con mucha autocorrelación el límite se acerca al PSI
+        # máximo posible con 5 tramos suavizados (~3) y nunca alertaría
+        return min(max(self.thresholds["drift_psi"], drift.psi_limit), self.thresholds["drift_psi_max"])
+
+    def _flag(self, key, condition, fecha, detail, clear=None):
+        if condition and key not in self.active:
+            self.active.add(key)
+            self.alert_count += 1
+            self.alerts.append({"fecha": fecha.isoformat(), "tipo": key, "detalle": detail})
+        elif key in self.active and (not condition if clear is None else clear):
+            self.active.discard(key)
+
+    # -----------------------------
+    # Consulta
+    # -----------------------------
+    def summary(self):
+        return {
+            "n": self.residuals.count,
+            "last_fecha": None if self.last_fecha is None else self.last_fecha.isoformat(),
+            "residual_mean": self.residuals.mean,
+            "residual_std": self.residuals.std,
+            "mae": self.abs_residuals.mean if self.abs_residuals.count else None,
+            "mae_24h": self.mae_24h.mean,
+            "mae_by_hour": [m.mean for m in self.mae_by_hour],
+            "drift": {name: {"shift": d.shift, "shift_limit": self._shift_limit(d), "psi": d.psi,
+                             "psi_limit": self._psi_limit(d)}
+                      for name, d in self.drift.items()},
+            "active_alerts": sorted(self.active),
+        }
+
+    def panel_frame(self):
+        return pd.DataFrame(list(self.panel), columns=["fecha", "demanda_pred", "demanda_real", "residuo", "mae_24h"])
+
+    # -----------------------------
+    # Persistencia
+    # -----------------------------
+    def to_dict(self):
+        return {
+            "thresholds": self.thresholds,
+            "residuals": self.residuals.to_dict(),
+            "abs_residuals": self.abs_residuals.to_dict(),
+            "mae_24h": self.mae_24h.to_dict(),
+            "mae_by_hour": [m.to_dict() for m in self.mae_by_hour],
+            "drift": {name: d.to_dict() for name, d in self.drift.items()},
+            "panel": {"maxlen": self.panel.maxlen, "rows": list(self.panel)},
+            "alerts": {"maxlen": self.alerts.maxlen, "rows": list(self.alerts)},
+            "active": sorted(self.active),
+            "alert_count": self.alert_count,
+            "last_fecha": None if self.last_fecha is None else self.last_fecha.isoformat(),
+            "summary": self.summary(),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        monitor = cls(panel_hours=state["panel"]["maxlen"], max_alerts=state["alerts"]["maxlen"], **state["thresholds"])
+        monitor.residuals = Welford(**state["residuals"])
+        monitor.abs_residuals = Welford(**state["abs_residuals"])
+        monitor.mae_24h = RollingMean(**state["mae_24h"])
+        monitor.mae_by_hour = [RollingMean(**m) for m in state["mae_by_hour"]]
+        monitor.drift = {name: FeatureDrift(**d) for name, d in state["drift"].items()}
+        monitor.panel.extend(state["panel"]["rows"])
+        monitor.alerts.extend(state["alerts"]["rows"])
+        monitor.active = set(state["active"])
+        monitor.alert_count = state["alert_count"]
+        monitor.last_fecha = pd.Timestamp(state["last_fecha"]) if state["last_fecha"] else None
+        return monitor
+
+    def save(self, path=STATE_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(json.dumps(self.to_dict()))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        try:
+            return cls.from_dict(json.loads(Path(path).read_text()))
+        except FileNotFoundError:
+            return None
+
+
+# -----------------------------------------
+# ALIMENTACIÓN DESDE EL HISTÓRICO
+# -----------------------------------------
+def new_pairs(store, predictor, since):
+    """Predicción a una hora vista y demanda real de cada hora posterior a ``since``.
+
+    Cada hora se predice con lo que se sabría en directo: retardos de 1 hora
+    o más y la media de las 24 horas anteriores (``compute_new_rows``), sin
+    la demanda real con la que luego se compara. Solo se leen las horas
+    nuevas más las ``HISTORY_HOURS`` anteriores para sus retardos, y de las
+    temperaturas solo el tramo de las horas nuevas; el resto del histórico
+    no se recorre.
+    """
+    cols = store.columns
+    since_s = (pd.Timestamp(since) - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)
+    first = int(np.searchsorted(cols["fecha"], since_s, side="right"))
+    if first >= len(cols["fecha"]):
+        return None
+    new_rows = pd.DataFrame({
+        "fecha": pd.to_datetime(np.asarray(cols["fecha"][first:]), unit="s", utc=True),
+        "demanda_real": np.asarray(cols["demanda_real"][first:], dtype=np.float64),
+        **{col: np.asarray(cols[col][first:]) for col in TEMP_COLUMNS if col in cols},
+    })
+    rows = compute_new_rows(cols["demanda_real"][max(first - HISTORY_HOURS, 0):first], merge_weather(new_rows))
+    rows["demanda_pred"] = predictor.predict(align_features(rows, predictor.features).to_numpy(dtype=np.float32))
+    return rows
+
+
+def feed(monitor, rows):
+    for row in rows.to_dict("records"):
+        monitor.update(row["fecha"], row, row["demanda_pred"], row["demanda_real"])
+    return len(rows)
+
+
+# -----------------------------------------
+# CLI
+# -----------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monitoriza residuos y deriva del modelo con las horas reales nuevas")
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Ruta del modelo, versión del registro (v0003) o 'latest'")
+    parser.add_argument("--data", default=str(HIST_PATH), help="Dataset histórico (CSV de origen de la caché)")
+    parser.add_argument("--state", default=str(STATE_PATH), help="Fichero con el estado del monitor")
+    parser.add_argument("--since", default=None,
+                        help="Al crear el monitor: primera hora monitorizada (las anteriores son la referencia)")
+    parser.add_argument("--reference-days", type=int, default=365, help="Días de referencia para la deriva")
+    parser.add_argument("--follow", action="store_true", help="Seguir comprobando horas nuevas cada --interval segundos")
+    parser.add_argument("--interval", type=float, default=60.0)
+    args = parser.parse_args(argv)
+
+    store = HistoricalStore(args.data, check_interval=0.0)
+    predictor = FastPredictor(ModelStore(resolve_model(args.model)).get())
+    monitor = Monitor.load(args.state)
+    if monitor is None:
+        last, _ = store.latest_demand(1)
+        since = pd.Timestamp(args.since, tz="UTC") if args.since else last
+        reference = build_features(merge_weather(store.to_frame()))
+        reference = reference[(reference["fecha"] <= since)
+                              & (reference["fecha"] > since - pd.Timedelta(days=args.reference_days))]
+        monitor = Monitor.with_reference(reference)
+        monitor.last_fecha = since
+        print(f"Monitor nuevo desde {since} (referencia: {len(reference):,} horas)")
+
+    while True:
+        start = time.perf_counter()
+        rows = new_pairs(store, predictor, monitor.last_fecha)
+        if rows is not None:
+            n_alerts = monitor.alert_count
+            fed = feed(monitor, rows)
+            monitor.save(args.state)
+            s = monitor.summary()
+            nuevas = monitor.alert_count - n_alerts
+            print(f"{fed:,} horas en {time.perf_counter() - start:.2f}s | MAE {s['mae']:,.0f} MW | "
+                  f"residuo {s['residual_mean']:+,.0f} ± {s['residual_std']:,.0f} MW | {nuevas} alertas nuevas")
+            for alert in list(monitor.alerts)[-nuevas:] if nuevas else []:
+                print(f"  [{alert['fecha']}] {alert['tipo']}: {alert['detalle']}")
+        if not args.follow:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from collections import OrderedDict
+import threading
+
+import numpy as np
+
+
+# -----------------------------------------
+# CACHÉ LRU DE PREDICCIONES
+# -----------------------------------------
+class PredictionCache:
+    """Caché LRU acotada de predicciones, compartida entre sesiones.
+
+    La clave es el vector de variables en el orden del modelo, cuantizado a
+    ``decimals`` decimales (los controles de la app son discretos, así que
+    las combinaciones se repiten mucho). La caché recuerda la versión del
+    modelo con la que se llenó y se vacía sola cuando cambia.
+    """
+
+    def __init__(self, maxsize=4096, decimals=3):
+        self.maxsize = maxsize
+        self.decimals = decimals
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key(self, row):
+        """Clave canónica de una fila (array 1-D o matriz de una fila)."""
+        return tuple(np.round(np.asarray(row, dtype=np.float64).ravel(), self.decimals).tolist())
+
+    def get(self, version, key):
+        with self._lock:
+            self._check_version(version)
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, version, key, value):
+        with self._lock:
+            self._check_version(version)
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, version, row, compute):
+        """Valor en caché para ``row`` o, si no está, ``compute()`` guardado."""
+        key = self.key(row)
+        value = self.get(version, key)
+        if value is None:
+            value = compute()
+            self.put(version, key, value)
+        return value
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self._version = version
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
@@ -0,0 +1,133 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+import json
+import os
+import threading
+import time
+
+PROFILE_ENV = "APP_PROFILE"  # "1" activa los temporizadores y el panel
+SAMPLER_ENV = "APP_PROFILE_SAMPLER"  # "1" añade el perfilador por muestreo (pyinstrument)
+LOG_ENV = "APP_PROFILE_LOG"  # ruta del log JSON-lines
+
+# Perfilador por muestreo activo en cada hilo: un rerun interrumpido
+# (``RerunException``/``StopException``) no llega a ``finish()`` y lo dejaría
+# en marcha, y pyinstrument no admite dos en el mismo hilo
+_ACTIVE = threading.local()
+
+
+def profiling_enabled():
+    return os.getenv(PROFILE_ENV, "").lower() in ("1", "true", "yes")
+
+
+# -----------------------------------------
+# TEMPORIZADOR POR RERUN
+# -----------------------------------------
+class StageTimer:
+    """Tiempos por fase de una ejecución del script.
+
+    ``with timer.stage("predict"): ...`` acumula el tiempo de la fase (si se
+    repite, se suma). Desactivado, ``stage`` no mide nada y su coste es el de
+    un ``with`` vacío.
+    """
+
+    def __init__(self, enabled=None, sampler=None):
+        self.enabled = profiling_enabled() if enabled is None else enabled
+        self.stages = defaultdict(float)
+        self._start = time.perf_counter()
+        self._profiler = None
+        if self.enabled and (sampler if sampler is not None else os.getenv(SAMPLER_ENV, "").lower() in ("1", "true", "yes")):
+            self._profiler = _start_sampler()
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start
+
+    def finish(self):
+        """Cierra la ejecución: devuelve (tiempos en s, informe del muestreo o None)."""
+        report = None
+        if self._profiler is not None:
+            _stop_sampler(self._profiler)
+            report = self._profiler.output_text(unicode=True, color=False)
+            self._profiler = None
+        stages = dict(self.stages)
+        stages["total"] = time.perf_counter() - self._start
+        return stages, report
+
+
+def _start_sampler():
+    # pyinstrument es opcional: si no está instalado seguimos solo con los temporizadores
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        return None
+    leftover = getattr(_ACTIVE, "profiler", None)
+    if leftover is not None:
+        _stop_sampler(leftover)
+    profiler = Profiler(interval=0.001, async_mode="disabled")
+    profiler.start()
+    _ACTIVE.profiler = profiler
+    return profiler
+
+
+def _stop_sampler(profiler):
+    if profiler.is_running:
+        profiler.stop()
+    if getattr(_ACTIVE, "profiler", None) is profiler:
+        _ACTIVE.profiler = None
+
+
+# -----------------------------------------
+# AGREGADO ENTRE SESIONES
+# -----------------------------------------
+class ProfileLog:
+    """Últimos tiempos de cada fase (todas las sesiones) y log JSON-lines."""
+
+    def __init__(self, log_path=None, history=1000):
+        self.log_path = Path(log_path) if log_path else None
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=history))
+        self.runs = 0
+        self.last_sampler_report = None
+
+    def record(self, stages, context=None, sampler_report=None):
+        with self._lock:
+            self.runs += 1
+            for name, seconds in stages.items():
+                self._samples[name].append(seconds)
+            if sampler_report:
+                self.last_sampler_report = sampler_report
+            if self.log_path is not None:
+                self.log_path.parent.mkdir(parents=True, exist_ok=True)
+                entry = {"ts": time.time(), **(context or {}), "stages_ms": {k: v * 1000 for k, v in stages.items()}}
+                with open(self.log_path, "a") as fh:
+                    fh.write(json.dumps(entry) + "\n")
+
+    def summary(self):
+        """p50/p95 en ms por fase."""
+        import numpy as np
+
+        with self._lock:
+            return {
+                name: {
+                    "n": len(values),
+                    "p50_ms": float(np.percentile(values, 50)) * 1000,
+                    "p95_ms": float(np.percentile(values, 95)) * 1000,
+                }
+                for name, values in self._samples.items()
+                if values
+            }
+
+
+def default_log_path(base_dir):
+    return Path(os.getenv(LOG_ENV, Path(base_dir) / "data" / "interim" / "profile.jsonl"))
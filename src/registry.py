@@ -0,0 +1,112 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from pathlib import Path
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from model_format import features_path, load_model, save_native
+
+BASE_DIR = Path().resolve()
+MODEL_PATH = BASE_DIR / "models" / "xgb_model.pkl"
+REGISTRY_DIR = BASE_DIR / "models" / "registry"
+MODEL_FILE = "model.ubj"
+LEGACY_MODEL_FILE = "model.pkl"
+METADATA_FILE = "metadata.json"
+_VERSION_RE = re.compile(r"v(\d{4,})")
+
+
+# -----------------------------------------
+# REGISTRO DE VERSIONES
+# -----------------------------------------
+class ModelRegistry:
+    """Modelos versionados en ``models/registry/vNNNN/`` con su ``metadata.json``.
+
+    Cada versión guarda el modelo en formato nativo de XGBoost (``model.ubj``
+    y ``model.features.json``; las versiones antiguas, ``model.pkl``), las
+    métricas de validación, la lista de variables, los hiperparámetros y de
+    qué versión parte (si fue un entrenamiento incremental). Las versiones no se modifican una vez
+    escritas: se crean en un directorio temporal y se renombran.
+    """
+
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = Path(root)
+
+    def versions(self):
+        if not self.root.exists():
+            return []
+        found = [p.name for p in self.root.iterdir() if p.is_dir() and _VERSION_RE.fullmatch(p.name)]
+        return sorted(found, key=lambda v: int(v[1:]))
+
+    def latest(self):
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def metadata(self, version):
+        return json.loads((self.root / version / METADATA_FILE).read_text())
+
+    def model_path(self, version):
+        if version == "latest":
+            version = self.latest()
+            if version is None:
+                raise FileNotFoundError(f"No hay modelos en el registro: {self.root}")
+        for name in (MODEL_FILE, LEGACY_MODEL_FILE):
+            path = self.root / version / name
+            if path.exists():
+                return path
+        raise FileNotFoundError(f"No se encontró la versión {version} en: {self.root}")
+
+    def save(self, model, metadata):
+        """Guarda ``model`` como la siguiente versión y devuelve su nombre."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=".tmp-", dir=self.root))
+        try:
+            save_native(model, tmp / MODEL_FILE)
+            while True:
+                latest = self.latest()
+                version = f"v{int(latest[1:]) + 1 if latest else 1:04d}"
+                metadata = {**metadata, "version": version, "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+                (tmp / METADATA_FILE).write_text(json.dumps(metadata, indent=2, default=str))
+                try:
+                    os.rename(tmp, self.root / version)
+                    return version
+                except OSError:
+                    # Otra ejecución ha creado la misma versión a la vez: probamos la siguiente
+                    if not (self.root / version).exists():
+                        raise
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    def promote(self, version, target=MODEL_PATH):
+        """Publica la versión como ``models/xgb_model.ubj`` de forma atómica.
+
+        ``ModelStore`` prefiere el formato nativo al pickle, así que la app
+        la recarga sola aunque siga apuntando a ``xgb_model.pkl``.
+        """
+        source = self.model_path(version)
+        target = Path(target).with_suffix(".ubj")
+        if source.name == LEGACY_MODEL_FILE:
+            return save_native(load_model(source), target)
+        # Primero las variables y después el modelo, que es el fichero vigilado
+        for src, dst in ((features_path(source), features_path(target)), (source, target)):
+            tmp = dst.with_name(f".{dst.name}.tmp")
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dst)
+        return target
+
+
+def is_registry_name(spec):
+    """``latest`` o una versión (``v0003``): nombres que no son rutas del disco."""
+    return spec == "latest" or bool(_VERSION_RE.fullmatch(str(spec)))
+
+
+def resolve_model(spec, registry=None):
+    """Ruta del modelo a partir de una ruta, una versión (``v0003``) o ``latest``."""
+    if is_registry_name(spec):
+        return (registry or ModelRegistry()).model_path(spec)
+    return Path(spec)
@@ -0,0 +1,369 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import argparse
+import json
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from forecast_service import FORECAST_DIR, ForecastCache, ForecastScheduler, freshness
+from history import HistoricalStore
+from model_pool import DEFAULT_BUDGET_MB, ModelPool
+from registry import resolve_model
+from prediction_cache import PredictionCache
+
+BASE_DIR = Path().resolve()
+MODEL_PATH = BASE_DIR / "models" / "xgb_model.pkl"
+HIST_PATH = BASE_DIR / "data" / "processed" / "dataset_consulta.csv"
+
+
+# -----------------------------------------
+# MICRO-BATCHING
+# -----------------------------------------
+class _Pending:
+    __slots__ = ("X", "enqueued", "done", "result", "error", "batch")
+
+    def __init__(self, X):
+        self.X = X
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.batch = None
+
+
+class MicroBatcher:
+    """Agrupa peticiones concurrentes en una sola llamada a ``predict``.
+
+    Un hilo trabajador espera la primera petición y sigue recogiendo las que
+    lleguen durante ``max_wait_ms`` o hasta juntar ``max_batch_rows`` filas;
+    después predice todas las filas de una vez y reparte los resultados.
+    Con ``cache`` las filas ya vistas no llegan a encolarse.
+    """
+
+    def __init__(self, model_store, max_batch_rows=512, max_wait_ms=5.0, history=1000, cache=None):
+        self.model_store = model_store
+        self.cache = cache
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._request_latencies = deque(maxlen=history)
+        self._batch_latencies = deque(maxlen=history)
+        self._batch_sizes = deque(maxlen=history)
+        self.requests = 0
+        self.batches = 0
+        self.rows = 0
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    @property
+    def features(self):
+        return [str(col) for col in self.model_store.get().feature_names_in_]
+
+    def predict(self, X):
+        """Predicciones para la matriz ``X`` (filas x variables del modelo)."""
+        start = time.perf_counter()
+        X = np.asarray(X, dtype=np.float32)
+        result = np.empty(len(X), dtype=np.float32)
+        batch = None
+        if self.cache is not None:
+            version = self.model_store.version
+            keys = [self.cache.key(row) for row in X]
+            cached = [self.cache.get(version, key) for key in keys]
+            todo = [i for i, value in enumerate(cached) if value is None]
+            for i, value in enumerate(cached):
+                if value is not None:
+                    result[i] = value
+        else:
+            todo = list(range(len(X)))
+
+        if todo:
+            pending = _Pending(X[todo])
+            self._queue.put(pending)
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            result[todo] = pending.result
+            batch = pending.batch
+            if self.cache is not None:
+                for i, value in zip(todo, pending.result):
+                    self.cache.put(version, keys[i], float(value))
+
+        latency = time.perf_counter() - start
+        with self._lock:
+            self.requests += 1
+            self._request_latencies.append(latency)
+        return result, latency, batch
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        rows = len(batch[0].X)
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch_rows:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item.X)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            start = time.perf_counter()
+            try:
+                X = np.vstack([item.X for item in batch])
+                preds = self.model_store.get().predict(X)
+            except Exception as exc:
+                for item in batch:
+                    item.error = exc
+                    item.done.set()
+                continue
+            elapsed = time.perf_counter() - start
+            info = {"requests": len(batch), "rows": len(X), "predict_ms": elapsed * 1000}
+            with self._lock:
+                self.batches += 1
+                self.rows += len(X)
+                self._batch_latencies.append(elapsed)
+                self._batch_sizes.append(len(X))
+            offset = 0
+            for item in batch:
+                item.result = preds[offset:offset + len(item.X)]
+                item.batch = info
+                offset += len(item.X)
+                item.done.set()
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "requests": self.requests,
+                "batches": self.batches,
+                "rows": self.rows,
+                "request_latency_ms": _percentiles(self._request_latencies),
+                "batch_latency_ms": _percentiles(self._batch_latencies),
+                "mean_batch_rows": float(np.mean(self._batch_sizes)) if self._batch_sizes else None,
+            }
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    arr = np.asarray(values) * 1000
+    return {"p50": float(np.percentile(arr, 50)), "p95": float(np.percentile(arr, 95)), "max": float(arr.max())}
+
+
+# -----------------------------------------
+# HTTP
+# -----------------------------------------
+class PredictionHandler(BaseHTTPRequestHandler):
+    """``POST /predict`` con un objeto o ``{"rows": [...]}``; ``GET /health``, ``/stats``, ``/models`` y ``/forecast``.
+
+    Con ``"model"`` (un nombre) o ``"models"`` (una lista) en el cuerpo se
+    predice con esos modelos del pool en lugar del de producción. Los
+    nombres son ``produccion``, ``latest`` o una versión del registro; rutas
+    del disco solo con ``--allow-model-paths``.
+    """
+
+    batcher = None  # se asigna en make_server
+    pool = None
+    forecasts = None
+    history = None
+    scheduler = None
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok", "model": self.batcher.model_store.metrics()})
+        elif self.path == "/stats":
+            stats = self.batcher.stats()
+            if self.scheduler is not None:
+                stats["forecast_scheduler"] = self.scheduler.stats()
+            self._send(200, stats)
+        elif self.path == "/models":
+            if self.pool is None:
+                self._send(404, {"error": "El servidor no tiene pool de modelos"})
+            else:
+                self._send(200, {**self.pool.stats(), "registry": self.pool.registry.versions()})
+        elif self.path == "/forecast":
+            # Pronóstico precalculado: solo se lee de la caché, nunca se calcula aquí
+            payload = self.forecasts.read() if self.forecasts is not None else None
+            if payload is None:
+                self._send(404, {"error": "Aún no hay pronóstico precalculado"})
+            else:
+                self._send(200, {**payload, "freshness": freshness(payload, self.history, self.batcher.model_store)})
+        else:
+            self._send(404, {"error": f"Ruta desconocida: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send(404, {"error": f"Ruta desconocida: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"null")
+            models = None
+            if isinstance(payload, dict) and ("model" in payload or "models" in payload):
+                payload = dict(payload)
+                models = payload.pop("models", None) or [payload.pop("model")]
+                payload.pop("model", None)
+            rows = payload["rows"] if isinstance(payload, dict) and "rows" in payload else [payload]
+            if models is not None:
+                self._predict_models(models, rows)
+                return
+            X = self._rows_to_matrix(rows)
+        except (ValueError, TypeError, KeyError) as exc:
+            self._send(400, {"error": str(exc)})
+            return
+
+        try:
+            preds, latency, batch = self.batcher.predict(X)
+        except Exception as exc:
+            self._send(500, {"error": str(exc)})
+            return
+        self._send(200, {
+            "predictions": [float(p) for p in preds],
+            "model_version": self.batcher.model_store.version,
+            "latency_ms": latency * 1000,
+            "batch": batch,
+        })
+
+    def _predict_models(self, models, rows):
+        # Varios modelos sobre las mismas filas: una llamada a predict por modelo
+        if self.pool is None:
+            self._send(400, {"error": "El servidor no tiene pool de modelos"})
+            return
+        if not isinstance(models, list) or not all(isinstance(m, str) for m in models):
+            raise ValueError("\"models\" debe ser una lista de nombres de modelo")
+        frame = pd.DataFrame(self._check_rows(rows), dtype=np.float32)
+        start = time.perf_counter()
+        try:
+            for name in models:
+                self.pool.resolve(name)  # ValueError (400) si no es un nombre admitido
+        except FileNotFoundError as exc:
+            self._send(404, {"error": str(exc)})
+            return
+        try:
+            features = {col for name in models for col in self.pool.predictor(name).features}
+        except FileNotFoundError as exc:
+            self._send(404, {"error": str(exc)})
+            return
+        except Exception as exc:
+            # Fichero que no es un modelo o que no se puede cargar
+            self._send(500, {"error": f"No se pudo cargar el modelo: {type(exc).__name__}: {exc}"})
+            return
+        missing = sorted(features - set(frame.columns))
+        if missing:
+            raise ValueError(f"Faltan variables: {missing}")
+        try:
+            preds = self.pool.compare(models, frame)
+        except Exception as exc:
+            self._send(500, {"error": str(exc)})
+            return
+        self._send(200, {
+            "predictions": {name: [float(p) for p in preds[name]] for name in preds.columns},
+            "model_versions": {name: self.pool.store(name).version for name in models},
+            "latency_ms": (time.perf_counter() - start) * 1000,
+        })
+
+    def _check_rows(self, rows):
+        if not isinstance(rows, list) or not rows or not all(isinstance(r, dict) for r in rows):
+            raise ValueError("Se espera un objeto JSON o {\"rows\": [objetos]} con las variables del modelo")
+        return rows
+
+    def _rows_to_matrix(self, rows):
+        self._check_rows(rows)
+        features = self.batcher.features
+        missing = sorted({col for row in rows for col in features if col not in row})
+        if missing:
+            raise ValueError(f"Faltan variables: {missing}")
+        return np.array([[float(row[col]) for col in features] for row in rows], dtype=np.float32)
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PredictionServer(ThreadingHTTPServer):
+    # El backlog por defecto (5) resetea conexiones con muchos clientes a la vez
+    request_queue_size = 128
+
+
+def make_server(host, port, model_store, max_batch_rows=512, max_wait_ms=5.0, cache=None,
+                forecasts=None, history=None, scheduler=None, pool=None):
+    batcher = MicroBatcher(model_store, max_batch_rows, max_wait_ms, cache=cache)
+    handler = type("Handler", (PredictionHandler,), {
+        "batcher": batcher, "forecasts": forecasts, "history": history, "scheduler": scheduler, "pool": pool,
+    })
+    return PredictionServer((host, port), handler)
+
+
+# -----------------------------------------
+# CLI
+# -----------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP de predicción de demanda")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Ruta del modelo, versión del registro (v0003) o 'latest'")
+    parser.add_argument("--max-batch-rows", type=int, default=512, help="Filas máximas por llamada a predict")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Espera máxima para agrupar peticiones")
+    parser.add_argument("--cache-size", type=int, default=4096, help="Entradas de la caché LRU (0 la desactiva)")
+    parser.add_argument("--model-budget-mb", type=float, default=DEFAULT_BUDGET_MB,
+                        help="Memoria máxima de los modelos cargados bajo demanda (\"model\"/\"models\" en /predict)")
+    parser.add_argument("--allow-model-paths", action="store_true",
+                        help="Admitir rutas del disco en \"model\"/\"models\" (cargar un pickle ejecuta código)")
+    parser.add_argument("--data", default=str(HIST_PATH), help="Dataset histórico (CSV de origen de la caché)")
+    parser.add_argument("--forecasts", default=str(FORECAST_DIR), help="Directorio de los pronósticos precalculados")
+    parser.add_argument("--precompute", action="store_true",
+                        help="Recalcular en segundo plano el pronóstico cuando lleguen datos nuevos")
+    parser.add_argument("--precompute-interval", type=float, default=30.0, help="Segundos entre comprobaciones")
+    args = parser.parse_args(argv)
+
+    # El modelo por defecto vive en el pool como uno más: comparte presupuesto
+    # y el mismo ModelStore con las peticiones que lo nombran
+    pool = ModelPool(resolve_model(args.model), args.model_budget_mb, allow_paths=args.allow_model_paths)
+    store = pool.store()
+    pool.predictor()  # cargamos al arrancar y no en la primera petición
+    cache = PredictionCache(args.cache_size) if args.cache_size > 0 else None
+    forecasts = ForecastCache(args.forecasts)
+    history = HistoricalStore(args.data)
+    scheduler = None
+    if args.precompute:
+        scheduler = ForecastScheduler(store, history, forecasts, interval=args.precompute_interval)
+        scheduler.start()
+    server = make_server(args.host, args.port, store, args.max_batch_rows, args.max_wait_ms, cache,
+                         forecasts, history, scheduler, pool)
+    print(f"Sirviendo en http://{args.host}:{args.port} (POST /predict, GET /health, GET /stats, GET /models, GET /forecast)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if scheduler is not None:
+            scheduler.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
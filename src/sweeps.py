@@ -0,0 +1,56 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+import numpy as np
+import pandas as pd
+
+from explain import contributions_frame
+from features import TEMP_COLUMNS
+
+# Valores por defecto de cada eje (los mismos rangos que los controles de la app)
+SWEEP_AXES = {
+    "hora": np.arange(0, 24),
+    "mes": np.arange(1, 13),
+    "dia_semana": np.arange(1, 8),
+    **{col: np.arange(-15, 49) for col in TEMP_COLUMNS},
+    **{col: np.arange(24000, 47001, 500) for col in ["demanda_lag_1", "demanda_lag_24", "demanda_lag_168", "media_movil_24h"]},
+}
+PRED_COLUMN = "demanda_pred"
+
+
+# -----------------------------------------
+# BARRIDOS DE SENSIBILIDAD
+# -----------------------------------------
+def sweep(predictor, base_row, axes, explain=False, approx=False):
+    """Predice una rejilla de 1 o 2 ejes en una sola llamada al modelo.
+
+    ``predictor`` es un ``FastPredictor``; ``base_row`` la fila (1 x n) con
+    el resto de variables fijas y ``axes`` un dict ordenado nombre -> valores.
+    La rejilla se construye por broadcasting: se repite la fila base y se
+    sobrescriben las columnas barridas. Si se barre ``dia_semana`` se
+    recalcula ``es_finde`` para que la fila siga siendo coherente. Devuelve
+    un DataFrame en formato largo (una columna por eje + ``demanda_pred``).
+
+    Con ``explain=True`` la misma llamada devuelve también las contribuciones
+    por variable (columnas ``contrib_*``, ver ``explain.py``).
+    """
+    if not 1 <= len(axes) <= 2:
+        raise ValueError("El barrido admite uno o dos ejes")
+    names = list(axes)
+    values = [np.asarray(axes[name], dtype=np.float32) for name in names]
+    grids = np.meshgrid(*values, indexing="ij")
+
+    base_row = np.asarray(base_row, dtype=np.float32).reshape(1, -1)
+    X = np.repeat(base_row, grids[0].size, axis=0)
+    for name, grid in zip(names, grids):
+        X[:, predictor.index[name]] = grid.ravel()
+    if "dia_semana" in names and "es_finde" in predictor.index:
+        X[:, predictor.index["es_finde"]] = X[:, predictor.index["dia_semana"]] >= 6
+
+    result = pd.DataFrame({name: grid.ravel() for name, grid in zip(names, grids)})
+    if not explain:
+        result[PRED_COLUMN] = predictor.predict(X)
+        return result
+    pred, contribs = predictor.explain(X, approx=approx)
+    result[PRED_COLUMN] = pred
+    return pd.concat([result, contributions_frame(predictor.features, contribs)], axis=1)
@@ -0,0 +1,172 @@
+# -----------------------------------------
+# IMPORTS
+# -----------------------------------------
+from pathlib import Path
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from backtest import regression_metrics
+from features import FEATURE_COLUMNS, LAG_COLUMNS, ROLLING_COLUMN, align_features, build_features
+from history import HistoricalStore
+from ingest_weather import merge_weather
+from model_store import ModelStore
+from registry import ModelRegistry, resolve_model
+
+BASE_DIR = Path().resolve()
+HIST_PATH = BASE_DIR / "data" / "processed" / "dataset_consulta.csv"
+
+DEFAULT_PARAMS = {
+    "n_estimators": 600,
+    "learning_rate": 0.05,
+    "max_depth": 8,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "tree_method": "hist",  # histogramas: entrenamiento multihilo y poca memoria
+    "n_jobs": -1,
+}
+
+
+# -----------------------------------------
+# DATOS
+# -----------------------------------------
+def load_training_frame(hist_path=HIST_PATH):
+    """Histórico con todas las variables del modelo (sin las primeras 168 horas).
+
+    Las temperaturas que no traiga el histórico se toman de la ingesta de
+    ``data/raw`` (``ingest_weather.py``), si existe.
+    """
+    df = build_features(merge_weather(HistoricalStore(hist_path).to_frame()))
+    return df.dropna(subset=[*LAG_COLUMNS, ROLLING_COLUMN]).reset_index(drop=True)
+
+
+def _split(df, valid_hours):
+    if valid_hours <= 0:
+        return df, df.iloc[0:0]
+    if len(df) <= valid_hours:
+        raise ValueError(f"Hay {len(df)} horas y se reservan {valid_hours} para validación")
+    return df.iloc[:-valid_hours], df.iloc[-valid_hours:]
+
+
+def _xy(df):
+    return align_features(df, FEATURE_COLUMNS), df["demanda_real"].to_numpy(dtype=np.float64)
+
+
+# -----------------------------------------
+# ENTRENAMIENTO
+# -----------------------------------------
+def train_full(df, valid_hours=24 * 30, params=None):
+    """Entrena desde cero con ``tree_method="hist"``; las últimas horas validan."""
+    from xgboost import XGBRegressor
+
+    train, valid = _split(df, valid_hours)
+    X_train, y_train = _xy(train)
+    model = XGBRegressor(**{**DEFAULT_PARAMS, **(params or {})})
+    model.fit(X_train, y_train)
+    return model, train, valid
+
+
+def train_warm_start(base_model, df, since, valid_hours=24 * 7, add_trees=100):
+    """Añade ``add_trees`` árboles al modelo base usando solo las horas posteriores a ``since``."""
+    from xgboost import XGBRegressor
+
+    since = pd.Timestamp(since)
+    if since.tzinfo is None:
+        since = since.tz_localize("UTC")
+    new = df[df["fecha"] > since]
+    if new.empty:
+        raise ValueError(f"No hay horas nuevas después de {since}")
+    train, valid = _split(new, valid_hours)
+    X_train, y_train = _xy(train)
+    params = {**base_model.get_params(), "n_estimators": add_trees, "tree_method": "hist", "n_jobs": -1,
+              "early_stopping_rounds": None}
+    model = XGBRegressor(**params)
+    model.fit(X_train, y_train, xgb_model=base_model.get_booster())
+    return model, train, valid
+
+
+def evaluate(model, valid):
+    """Métricas sobre ``valid`` con su ventana (``window``).
+
+    Cada modo valida con horas distintas (los últimos 30 días en un
+    entrenamiento completo, las últimas 7 de las horas nuevas en warm start),
+    así que dos MAE solo son comparables si coincide la ventana.
+    """
+    if valid.empty:
+        return None
+    X_valid, y_valid = _xy(valid)
+    metrics = regression_metrics(y_valid, model.predict(X_valid).astype(np.float64))
+    return {**metrics, "window": _data_summary(valid)}
+
+
+def _data_summary(train):
+    return {"rows": len(train), "first_fecha": str(train["fecha"].iloc[0]), "last_fecha": str(train["fecha"].iloc[-1])}
+
+
+# -----------------------------------------
+# CLI
+# -----------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entrena el modelo de demanda y lo guarda en el registro")
+    parser.add_argument("--data", default=str(HIST_PATH), help="Dataset histórico (CSV de origen de la caché)")
+    parser.add_argument("--warm-start", action="store_true", help="Añadir árboles a un modelo existente con las horas nuevas")
+    parser.add_argument("--base", default="latest", help="Modelo base para --warm-start (versión, 'latest' o ruta)")
+    parser.add_argument("--since", default=None, help="Con un modelo base fuera del registro: fecha de corte de sus datos")
+    parser.add_argument("--add-trees", type=int, default=100)
+    parser.add_argument("--valid-hours", type=int, default=None, help="Horas finales reservadas para validar (0 = ninguna)")
+    parser.add_argument("--n-estimators", type=int, default=None)
+    parser.add_argument("--promote", action="store_true", help="Publicar la nueva versión como modelo de producción (models/xgb_model.ubj)")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry()
+    start = time.perf_counter()
+    df = load_training_frame(args.data)
+    # Lectura del histórico, variables y temperaturas; no cuenta como entrenamiento
+    load_seconds = time.perf_counter() - start
+
+    if args.warm_start:
+        base_spec = args.base
+        base_version = registry.latest() if base_spec == "latest" else base_spec
+        base_model = ModelStore(resolve_model(base_spec, registry)).get()
+        since = args.since
+        if since is None:
+            if base_version is None or not str(base_version).startswith("v"):
+                raise SystemExit("Para un modelo base fuera del registro hay que indicar --since")
+            since = registry.metadata(base_version)["data"]["last_fecha"]
+        valid_hours = 24 * 7 if args.valid_hours is None else args.valid_hours
+        start = time.perf_counter()
+        model, train, valid = train_warm_start(base_model, df, since, valid_hours, args.add_trees)
+        lineage = {"mode": "warm_start", "parent": str(base_version or base_spec), "since": since,
+                   "added_trees": args.add_trees}
+    else:
+        valid_hours = 24 * 30 if args.valid_hours is None else args.valid_hours
+        params = {"n_estimators": args.n_estimators} if args.n_estimators else None
+        start = time.perf_counter()
+        model, train, valid = train_full(df, valid_hours, params)
+        lineage = {"mode": "full", "parent": None}
+
+    fit_seconds = time.perf_counter() - start
+    metrics = evaluate(model, valid)
+    version = registry.save(model, {
+        **lineage,
+        "features": [str(col) for col in model.feature_names_in_],
+        "params": {k: v for k, v in model.get_params().items() if v is not None and not (isinstance(v, float) and np.isnan(v))},
+        "n_trees": model.get_booster().num_boosted_rounds(),
+        "metrics": metrics,
+        "valid_hours": len(valid),
+        "data": _data_summary(train),
+        "fit_seconds": fit_seconds,
+        "load_seconds": load_seconds,
+    })
+    print(f"Versión {version} ({lineage['mode']}) en {fit_seconds:.1f}s (+{load_seconds:.1f}s de carga): "
+          + (f"MAE {metrics['mae']:.1f} MW | RMSE {metrics['rmse']:.1f} MW | R2 {metrics['r2']:.4f} "
+             f"(validación {metrics['window']['first_fecha'][:10]}..{metrics['window']['last_fecha'][:10]})"
+             if metrics else "sin validación"))
+    if args.promote:
+        print(f"Promocionada a {registry.promote(version)}")
+
+
+if __name__ == "__main__":
+    main()
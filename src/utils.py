@@ -1,13 +1,30 @@
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 import pandas as pd
+import threading
 
 # load the .env file variables
 load_dotenv()
 
+_engine = None
+_engine_lock = threading.Lock()
 
-def db_connect():
+
+def db_connect(url=None):
+    """Return the process-wide pooled engine, creating it on first use.
+
+    Connections are borrowed from the pool with ``with engine.connect()`` and
+    returned when the block ends; ``pool_pre_ping`` discards dead ones.
+    """
     import os
-    engine = create_engine(os.getenv('DATABASE_URL'))
-    engine.connect()
-    return engine
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            url = url or os.getenv('DATABASE_URL')
+            if not url:
+                raise RuntimeError("DATABASE_URL is not set")
+            options = {"pool_pre_ping": True}
+            if not url.startswith("sqlite"):
+                options.update(pool_size=5, max_overflow=5, pool_recycle=1800)
+            _engine = create_engine(url, **options)
+        return _engine
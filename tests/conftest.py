@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Los módulos de src/ se importan sin paquete, como al ejecutarlos como script
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+import ingest_db
+from history import HistoricalStore
+from ingest_db import read_watermark, sync
+
+START = pd.Timestamp("2024-01-01", tz="UTC")
+CSV_HOURS = 48
+
+
+def _hours(first, n):
+    return pd.date_range(START + pd.Timedelta(hours=first), periods=n, freq="h")
+
+
+@pytest.fixture
+def setup(tmp_path):
+    """CSV con las primeras 48 horas y una tabla SQLite con las siguientes."""
+    fechas = _hours(0, CSV_HOURS)
+    pd.DataFrame({
+        "fecha": fechas.astype(str), "year": fechas.year, "mes": fechas.month, "hora": fechas.hour,
+        "es_finde": (fechas.weekday >= 5).astype(int), "demanda_real": np.arange(CSV_HOURS, dtype=float),
+    }).to_csv(tmp_path / "dataset_consulta.csv", index=False)
+    engine = create_engine(f"sqlite:///{tmp_path / 'demanda.db'}")
+    _insert(engine, CSV_HOURS, 72)
+    return tmp_path, engine
+
+
+def _insert(engine, first, n):
+    fechas = _hours(first, n)
+    pd.DataFrame({
+        "fecha": fechas.strftime("%Y-%m-%d %H:%M:%S+00:00"),
+        "demanda_real": np.arange(first, first + n, dtype=float),
+    }).to_sql("demanda_horaria", engine, index=False, if_exists="append")
+
+
+def _store(tmp_path):
+    return HistoricalStore(tmp_path / "dataset_consulta.csv", check_interval=0.0)
+
+
+def _assert_contiguous(store, hours):
+    df = store.to_frame()
+    assert len(df) == hours
+    assert df["fecha"].is_unique
+    assert (df["fecha"].diff().dropna() == pd.Timedelta(hours=1)).all()
+    np.testing.assert_allclose(df["demanda_real"], np.arange(hours))
+
+
+def test_first_sync_brings_all_new_hours(setup):
+    tmp_path, engine = setup
+    state = tmp_path / "state.json"
+    assert sync(engine, _store(tmp_path), state_path=state, chunksize=24) == 72
+    _assert_contiguous(_store(tmp_path), CSV_HOURS + 72)
+    assert pd.Timestamp(read_watermark(state, "demanda_horaria")) == _hours(CSV_HOURS + 71, 1)[0]
+
+
+def test_incremental_sync_only_reads_new_hours(setup):
+    tmp_path, engine = setup
+    state = tmp_path / "state.json"
+    sync(engine, _store(tmp_path), state_path=state, chunksize=24)
+    _insert(engine, CSV_HOURS + 72, 10)
+    assert sync(engine, _store(tmp_path), state_path=state, chunksize=24) == 10
+    assert sync(engine, _store(tmp_path), state_path=state, chunksize=24) == 0
+    _assert_contiguous(_store(tmp_path), CSV_HOURS + 82)
+
+
+def test_resume_after_crash_between_append_and_watermark(setup, monkeypatch):
+    tmp_path, engine = setup
+    state = tmp_path / "state.json"
+    sync(engine, _store(tmp_path), state_path=state, chunksize=24)
+    watermark = read_watermark(state, "demanda_horaria")
+    _insert(engine, CSV_HOURS + 72, 48)
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("proceso interrumpido")
+
+    # El primer bloque nuevo llega al almacén pero la marca de agua no se guarda
+    monkeypatch.setattr(ingest_db, "write_watermark", crash)
+    with pytest.raises(RuntimeError):
+        sync(engine, _store(tmp_path), state_path=state, chunksize=24)
+    monkeypatch.undo()
+
+    assert read_watermark(state, "demanda_horaria") == watermark
+    assert sync(engine, _store(tmp_path), state_path=state, chunksize=24) == 24
+    _assert_contiguous(_store(tmp_path), CSV_HOURS + 120)
+
+
+def test_synced_hours_survive_cache_rebuild(setup):
+    tmp_path, engine = setup
+    state = tmp_path / "state.json"
+    sync(engine, _store(tmp_path), state_path=state, chunksize=24)
+    # Un CSV modificado (mtime/tamaño) regenera la caché desde el CSV
+    csv = tmp_path / "dataset_consulta.csv"
+    stat = csv.stat()
+    os.utime(csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert sync(engine, _store(tmp_path), state_path=state, chunksize=24) == 0
+    _assert_contiguous(_store(tmp_path), CSV_HOURS + 72)
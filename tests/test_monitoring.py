@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from monitoring import Monitor
+
+COLUMN = "Madrid_temperature_2m"
+SEEDS = range(20)
+
+
+def _temperature(seed, days):
+    """Temperatura horaria sintética: estación, ciclo diario y anomalía AR(1) (ρ diario ≈ 0,74)."""
+    rng = np.random.default_rng(seed)
+    fechas = pd.date_range("2022-01-01", periods=days * 24, freq="h", tz="UTC")
+    phi = 0.9875
+    noise = rng.normal(0, 3 * np.sqrt(1 - phi ** 2), len(fechas))
+    anomaly = np.zeros(len(fechas))
+    for i in range(1, len(fechas)):
+        anomaly[i] = phi * anomaly[i - 1] + noise[i]
+    doy, hour = fechas.dayofyear.to_numpy(), fechas.hour.to_numpy()
+    temp = 15 + 10 * np.sin(2 * np.pi * (doy - 100) / 365) + 5 * np.sin(2 * np.pi * (hour - 9) / 24) + anomaly
+    return pd.DataFrame({"fecha": fechas, COLUMN: temp})
+
+
+def _drift_active(seed, shift_sigma, warm_days=30, days=35):
+    """Año de referencia, ``warm_days`` sin cambios y ``days`` desplazados ``shift_sigma`` σ.
+
+    Devuelve si la alerta de deriva está activa al final.
+    """
+    df = _temperature(seed, 365 + warm_days + days)
+    reference, current = df.iloc[:365 * 24], df.iloc[365 * 24:].copy()
+    monitor = Monitor.with_reference(reference, columns=[COLUMN])
+    sigma = float(np.mean(monitor.drift[COLUMN].month_std))
+    current.loc[current.index[warm_days * 24:], COLUMN] += shift_sigma * sigma
+    for fecha, value in zip(current["fecha"], current[COLUMN]):
+        monitor.update(fecha, {COLUMN: value}, 0.0, 0.0)
+    return f"deriva_{COLUMN}" in monitor.active
+
+
+def test_sustained_one_sigma_shift_alerts_within_five_weeks():
+    detected = sum(_drift_active(seed, 1.0) for seed in SEEDS)
+    assert detected >= 0.7 * len(SEEDS)
+
+
+def test_few_drift_alerts_without_shift():
+    false_alarms = sum(_drift_active(seed, 0.0) for seed in SEEDS)
+    assert false_alarms <= 0.1 * len(SEEDS)